@@ -0,0 +1,263 @@
+import asyncio
+import itertools
+import logging
+from concurrent.futures import Future
+from threading import Thread, current_thread
+from typing import Any, Coroutine, Iterable
+
+from graph import JobGraph
+from jobs import (
+    ASYNC_JOB_TYPES,
+    DEFAULT_CLOCK,
+    AsyncJob,
+    Clock,
+    Codec,
+    HttpSession,
+    Job,
+    JsonCodec,
+    ResultCache,
+    RetryPolicy,
+)
+from scheduler import (
+    SCHEDULE_CHUNK,
+    SingletonMeta,
+    read_lockfile,
+    write_lockfile,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncScheduler(metaclass=SingletonMeta):
+    """Scheduler running jobs as coroutines on one asyncio event loop
+
+    Has the same interface and lock file format as `Scheduler`,
+    futures of scheduled jobs are resolved on the event loop thread
+    Async jobs overlap their I/O, plain jobs are iterated synchronously
+    The event loop runs in a daemon thread
+    """
+
+    def __init__(
+        self,
+        *,
+        pool_size: int = 10,
+        lockfile: str = "scheduler.lock",
+        http_session: HttpSession | None = None,
+        codec: Codec | None = None,
+        clock: Clock | None = None,
+        cache: ResultCache | None = None,
+        retry_policy: RetryPolicy | None = None,
+    ):
+        self.tasks_active = []
+        self.pool_size = pool_size
+        self.tasks_wait = []
+        self.tasks_delayed = []
+        self.graph = JobGraph()
+        self.drivers: dict[Job, asyncio.Task] = {}
+        self.futures: dict[Job, Future] = {}
+        self.lockfile = lockfile
+        self.codec = codec or JsonCodec()
+        self.clock = clock or DEFAULT_CLOCK
+        self.http_session = http_session or HttpSession()
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.loop = asyncio.new_event_loop()
+        self.slots = asyncio.Semaphore(pool_size)
+        self.resumed = asyncio.Event()
+        self.resumed.set()
+        self.changed = asyncio.Condition()
+        self.event_loop_thread = None
+
+    def schedule(self, task: Job) -> Future:
+        """Schedules task with its dependencies
+
+        Returns future resolved with the job once it is done
+        Raises DependencyCycleError if dependencies form a cycle
+        """
+        return self.schedule_many([task])[0]
+
+    def schedule_many(self, tasks: Iterable[Job]) -> list[Future]:
+        """Schedules tasks with their dependencies
+
+        Tasks are taken from `tasks` by chunks of `SCHEDULE_CHUNK`
+        outside of the event loop, one event loop call per chunk
+        Returns futures of the tasks in their order
+        Raises DependencyCycleError if dependencies form a cycle
+        Called from a job step, tasks are added right away
+        Does not resume a paused scheduler
+        """
+        if current_thread() is self.event_loop_thread:
+            return self.__add(tasks)
+        futures = []
+        tasks = iter(tasks)
+        while chunk := list(itertools.islice(tasks, SCHEDULE_CHUNK)):
+            futures += self.__call(self.__schedule(chunk))
+        return futures
+
+    def run(self):
+        self.__call(self.__resume())
+
+    def restart(self):
+        """Restarts scheduler
+
+        Reads saved task states
+        Restores waiting, active tasks
+        Starts event loop
+        """
+        jobs = read_lockfile(self.lockfile, ASYNC_JOB_TYPES, self.codec)
+        self.__call(self.__schedule(jobs))
+        self.run()
+
+    def pause(self):
+        self.__call(self.__pause())
+
+    def stop(self):
+        """Stops scheduler
+
+        Stops event loop and tasks
+        Dumps waiting, active tasks states to filesystem
+        Cancels job coroutines and clears task queues,
+        cancels futures of unfinished tasks
+        """
+        self.__call(self.__stop())
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Waits until all scheduled jobs are done
+
+        Returns False if `timeout` seconds passed first
+        """
+        return self.__call(self.__join(timeout))
+
+    def __call(self, coro: Coroutine) -> Any:
+        """Runs coroutine on the event loop thread and waits for result"""
+        if self.event_loop_thread is None:
+            self.event_loop_thread = Thread(
+                target=self.loop.run_forever, daemon=True
+            )
+            self.event_loop_thread.start()
+            logger.info("event loop: started for the first time")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def __schedule(self, tasks: Iterable[Job]) -> list[Future]:
+        return self.__add(tasks)
+
+    def __add(self, tasks: Iterable[Job]) -> list[Future]:
+        futures = []
+        for task in tasks:
+            for job in self.graph.add(task):
+                job.attach(self)
+                self.futures[job] = Future()
+                if self.graph.is_ready(job):
+                    self.__start(job)
+            futures.append(self.futures[task])
+        return futures
+
+    async def __resume(self):
+        self.resumed.set()
+        logger.info("event loop: started")
+
+    async def __pause(self):
+        self.resumed.clear()
+        logger.info("event loop: stopped")
+
+    async def __stop(self):
+        await self.__pause()
+        for task in self.tasks_active:
+            task.stop()
+        waiting = [*self.tasks_wait, *self.tasks_delayed, *self.graph.blocked]
+        write_lockfile(
+            self.lockfile, self.tasks_active, waiting, self.codec
+        )
+        drivers = list(self.drivers.values())
+        for driver in drivers:
+            driver.cancel()
+        await asyncio.gather(*drivers, return_exceptions=True)
+        self.tasks_active = []
+        self.tasks_wait = []
+        self.tasks_delayed = []
+        self.graph = JobGraph()
+        self.drivers = {}
+        self.slots = asyncio.Semaphore(self.pool_size)
+        futures, self.futures = self.futures, {}
+        for future in futures.values():
+            future.cancel()
+
+    async def __join(self, timeout: float | None) -> bool:
+        try:
+            await asyncio.wait_for(self.__wait_empty(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def __wait_empty(self):
+        async with self.changed:
+            await self.changed.wait_for(lambda: len(self.graph) == 0)
+
+    def __resolve(self, job: Job):
+        """Resolves future of done job with the job or its error"""
+        future = self.futures.pop(job, None)
+        if future is None or not future.set_running_or_notify_cancel():
+            return
+        if job.error is not None:
+            future.set_exception(job.error)
+        else:
+            future.set_result(job)
+
+    async def __park(self, job: Job):
+        """Waits until the thing job waits for happens"""
+        unparked = self.loop.create_future()
+
+        def wake():
+            if not unparked.done():
+                unparked.set_result(None)
+
+        if job.parked_on.subscribe(
+            lambda: self.loop.call_soon_threadsafe(wake)
+        ):
+            await unparked
+
+    def __start(self, job: Job):
+        self.drivers[job] = self.loop.create_task(self.__drive(job))
+
+    async def __drive(self, job: Job):
+        """Job coroutine
+
+        Sleeps until job start time
+        Waits for a free slot in the pool
+        Runs one iteration at a time, yielding to other jobs in between
+        Sleeps while job backs off before a retry
+        Starts dependents when job is done
+        """
+        delay = (job.time_start - self.clock.now()).total_seconds()
+        if delay > 0:
+            self.tasks_delayed.append(job)
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.tasks_delayed.remove(job)
+        self.tasks_wait.append(job)
+        try:
+            await self.slots.acquire()
+        finally:
+            self.tasks_wait.remove(job)
+        self.tasks_active.append(job)
+        try:
+            while not job.is_finished:
+                await self.resumed.wait()
+                if isinstance(job, AsyncJob):
+                    await job.arun()
+                else:
+                    job.run()
+                if job.parked_on is not None:
+                    await self.__park(job)
+                await asyncio.sleep(job.time_to_start())
+        finally:
+            self.tasks_active.remove(job)
+            self.slots.release()
+        logger.info("event loop: job %s finished", job)
+        del self.drivers[job]
+        for dependent in self.graph.finish(job):
+            self.__start(dependent)
+        self.__resolve(job)
+        async with self.changed:
+            self.changed.notify_all()
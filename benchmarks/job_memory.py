@@ -0,0 +1,55 @@
+"""Memory held by queued jobs
+
+Usage: python -m benchmarks.job_memory [--jobs N]
+
+Reports bytes per job waiting in the wait queue, and per job after
+its first step, when it holds a generator
+"""
+import argparse
+import gc
+import tracemalloc
+from typing import Callable
+
+from jobs import EmptyJob, Job, SystemJob, SystemAction
+from wait_queue import WaitQueue
+
+JOBS = 100_000
+
+
+def measure(make: Callable[[], Job], count: int, step: bool) -> float:
+    """Returns bytes allocated per job pushed to the wait queue"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        queue = WaitQueue()
+        for _ in range(count):
+            job = make()
+            if step:
+                job._generator()
+            queue.push(job)
+        allocated, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return allocated / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=JOBS)
+    args = parser.parse_args()
+
+    cases = {
+        "EmptyJob": EmptyJob,
+        "SystemJob": lambda: SystemJob(
+            [[SystemAction.CREATE, "file.txt"]]
+        ),
+    }
+    print(f"{'job':<12}{'queued, B':>12}{'started, B':>12}")
+    for name, make in cases.items():
+        queued = measure(make, args.jobs, step=False)
+        started = measure(make, args.jobs, step=True)
+        print(f"{name:<12}{queued:>12.0f}{started:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Per-step overhead of `Job.run()`
+
+Usage: python -m benchmarks.job_step [--steps N]
+
+Compares state captured on demand with state captured and logged
+after every step, as jobs did before
+"""
+import argparse
+import logging
+import time
+
+from jobs import InfiniteJob, Job
+
+logger = logging.getLogger(__name__)
+
+
+STEPS = 100_000
+
+
+class EagerInfiniteJob(InfiniteJob):
+    """Captures and formats its state after every step"""
+
+    def _save_state(self):
+        super()._save_state()
+        logger.info(f"self._state: {self._state}")
+
+
+def measure(job: Job, steps: int) -> float:
+    """Returns seconds per step"""
+    start = time.perf_counter()
+    for _ in range(steps):
+        job.run()
+    return (time.perf_counter() - start) / steps
+
+
+def finished_jobs(count: int) -> list[Job]:
+    jobs = [InfiniteJob() for _ in range(count)]
+    for job in jobs:
+        job.stop()
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=STEPS)
+    args = parser.parse_args()
+
+    cases = {
+        "no dependencies": lambda klass: klass(),
+        "10 dependencies": lambda klass: klass(
+            dependencies=finished_jobs(10)
+        ),
+    }
+    print(f"{'case':<20}{'eager, us':>12}{'lazy, us':>12}{'speedup':>10}")
+    for name, make in cases.items():
+        eager = measure(make(EagerInfiniteJob), args.steps)
+        lazy = measure(make(InfiniteJob), args.steps)
+        print(
+            f"{name:<20}{eager * 1e6:>12.2f}{lazy * 1e6:>12.2f}"
+            f"{eager / lazy:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""Scheduler throughput, latency and persistence benchmarks
+
+Usage: python -m benchmarks.scheduler [--output FILE] [--baseline FILE]
+                                      [--quick]
+
+Writes results as JSON, so that runs on different commits can be
+compared with `--baseline`
+"""
+import argparse
+import json
+import os
+import platform
+import queue
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import timedelta
+from typing import Any, Callable
+
+from jobs import Channel, EmptyJob, InfiniteJob, Job
+from scheduler import Scheduler
+
+JOB_COUNTS = [10, 1_000, 100_000]
+DELAYED_JOBS = 100
+DELAY = 0.2
+CHAIN_DEPTHS = [10, 100, 1_000]
+CONVEYOR_ITEMS = 10_000
+CHANNEL_SIZE = 64
+QUEUE_SIZES = [100, 1_000, 10_000]
+QUICK = {
+    "job_counts": [10, 1_000],
+    "chain_depths": [10, 100],
+    "conveyor_items": 1_000,
+    "queue_sizes": [100, 1_000],
+}
+
+Result = dict[str, float]
+
+
+def new_scheduler(**kwargs) -> Scheduler:
+    """Scheduler is a singleton, each case needs a fresh one
+
+    Lock file is discarded unless it is given
+    """
+    Scheduler._instances.clear()
+    return Scheduler(**{"lockfile": os.devnull, **kwargs})
+
+
+def percentile(values: list[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+class StartRecordingJob(Job):
+    """Remembers when its first step started"""
+
+    def target(self):
+        self.started_at = self.clock.now()
+        yield
+
+
+class StageJob(Job):
+    """Conveyor stage running `stage(channel_in, channel_out)`"""
+
+    def __init__(self, stage: Callable, *channels: Channel, **kwargs):
+        self.stage = stage
+        self.channels = channels
+        super().__init__(**kwargs)
+
+    def target(self):
+        return self.stage(*self.channels)
+
+
+def produce(channel_out: Channel, items: int):
+    for item in range(items):
+        while channel_out.full():
+            yield channel_out.writable()
+        channel_out.put_nowait(item)
+        yield
+    channel_out.close()
+
+
+def square(channel_in: Channel, channel_out: Channel):
+    while True:
+        closed = channel_in.closed
+        try:
+            item = channel_in.get_nowait()
+        except queue.Empty:
+            if closed:
+                break
+            yield channel_in.readable()
+            continue
+        while channel_out.full():
+            yield channel_out.writable()
+        channel_out.put_nowait(item**2)
+        yield
+    channel_out.close()
+
+
+def collect(channel_in: Channel, received: list[int]):
+    while True:
+        closed = channel_in.closed
+        try:
+            received.append(channel_in.get_nowait())
+        except queue.Empty:
+            if closed:
+                break
+            yield channel_in.readable()
+            continue
+        yield
+
+
+def empty_jobs(count: int) -> Result:
+    """Steps of `EmptyJob`s per second until all of them are done"""
+    jobs = [EmptyJob() for _ in range(count)]
+    scheduler = new_scheduler()
+    scheduler.run()
+    start = time.perf_counter()
+    for job in jobs:
+        scheduler.schedule(job)
+    scheduler.join()
+    elapsed = time.perf_counter() - start
+    steps = sum(job.stats.steps for job in jobs)
+    scheduler.stop()
+    return {
+        "seconds": elapsed,
+        "jobs_per_sec": count / elapsed,
+        "steps_per_sec": steps / elapsed,
+    }
+
+
+def delayed_start(count: int, delay: float) -> Result:
+    """Lateness of jobs with `start_at` in milliseconds"""
+    scheduler = new_scheduler()
+    scheduler.run()
+    start_at = Job.now() + timedelta(seconds=delay)
+    jobs = [StartRecordingJob(start_at=start_at) for _ in range(count)]
+    for job in jobs:
+        scheduler.schedule(job)
+    scheduler.join()
+    scheduler.stop()
+    lateness = [
+        (job.started_at - start_at).total_seconds() * 1000 for job in jobs
+    ]
+    return {
+        "p50_ms": statistics.median(lateness),
+        "p99_ms": percentile(lateness, 0.99),
+        "max_ms": max(lateness),
+    }
+
+
+def dependency_chain(depth: int) -> Result:
+    """Each job of the chain depends on the previous one"""
+    jobs = [EmptyJob()]
+    for _ in range(depth - 1):
+        jobs.append(EmptyJob(dependencies=[jobs[-1]]))
+    scheduler = new_scheduler()
+    scheduler.run()
+    start = time.perf_counter()
+    scheduler.schedule(jobs[-1])
+    scheduled = time.perf_counter() - start
+    scheduler.join()
+    elapsed = time.perf_counter() - start
+    scheduler.stop()
+    return {
+        "schedule_seconds": scheduled,
+        "seconds": elapsed,
+        "us_per_job": elapsed / depth * 1e6,
+    }
+
+
+def conveyor(items: int, channel_size: int) -> Result:
+    """Producer, transformer and consumer connected by channels"""
+    channel_in = Channel(channel_size)
+    channel_out = Channel(channel_size)
+    received = []
+    scheduler = new_scheduler()
+    scheduler.run()
+    start = time.perf_counter()
+    for job in [
+        StageJob(produce, channel_in, items),
+        StageJob(square, channel_in, channel_out),
+        StageJob(collect, channel_out, received),
+    ]:
+        scheduler.schedule(job)
+    scheduler.join()
+    elapsed = time.perf_counter() - start
+    scheduler.stop()
+    if len(received) != items:
+        raise RuntimeError(f"Conveyor lost items: {len(received)}/{items}")
+    return {"seconds": elapsed, "items_per_sec": items / elapsed}
+
+
+def stop_restart(size: int, directory: str) -> Result:
+    """Persisting and restoring `size` scheduled jobs"""
+    lockfile = os.path.join(directory, f"scheduler-{size}.lock")
+    scheduler = new_scheduler(lockfile=lockfile)
+    for _ in range(size):
+        scheduler.schedule(InfiniteJob())
+    scheduler.pause()
+    start = time.perf_counter()
+    scheduler.stop()
+    stopped = time.perf_counter() - start
+    start = time.perf_counter()
+    scheduler.restart()
+    scheduler.pause()
+    restarted = time.perf_counter() - start
+    restored = len(scheduler.tasks_active) + len(scheduler.tasks_wait)
+    scheduler.stop()
+    if restored != size:
+        raise RuntimeError(f"Restart lost jobs: {restored}/{size}")
+    return {
+        "stop_seconds": stopped,
+        "restart_seconds": restarted,
+        "lockfile_bytes": os.path.getsize(lockfile),
+    }
+
+
+def environment() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def run(settings: dict[str, Any]) -> dict[str, dict[str, Result]]:
+    results = {
+        "empty_jobs": {
+            str(count): empty_jobs(count) for count in settings["job_counts"]
+        },
+        "delayed_start": {
+            str(DELAYED_JOBS): delayed_start(DELAYED_JOBS, DELAY)
+        },
+        "dependency_chain": {
+            str(depth): dependency_chain(depth)
+            for depth in settings["chain_depths"]
+        },
+        "conveyor": {
+            str(settings["conveyor_items"]): conveyor(
+                settings["conveyor_items"], CHANNEL_SIZE
+            )
+        },
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        results["stop_restart"] = {
+            str(size): stop_restart(size, directory)
+            for size in settings["queue_sizes"]
+        }
+    return results
+
+
+def compare(results: dict, baseline: dict):
+    """Prints change of every metric against baseline run"""
+    print(f"{'metric':<48}{'baseline':>12}{'current':>12}{'change':>9}")
+    for case, params in results.items():
+        for param, metrics in params.items():
+            before = baseline.get(case, {}).get(param, {})
+            for name, value in metrics.items():
+                if name not in before:
+                    continue
+                change = 0.0
+                if before[name]:
+                    change = (value / before[name] - 1) * 100
+                print(
+                    f"{f'{case}[{param}].{name}':<48}"
+                    f"{before[name]:>12.4g}{value:>12.4g}{change:>+8.1f}%"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", help="results of a previous run")
+    parser.add_argument(
+        "--quick", action="store_true", help="skip the largest sizes"
+    )
+    args = parser.parse_args()
+
+    settings = {
+        "job_counts": JOB_COUNTS,
+        "chain_depths": CHAIN_DEPTHS,
+        "conveyor_items": CONVEYOR_ITEMS,
+        "queue_sizes": QUEUE_SIZES,
+    }
+    if args.quick:
+        settings.update(QUICK)
+    report = {"environment": environment(), "results": run(settings)}
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as file:
+            compare(report["results"], json.load(file)["results"])
+
+
+if __name__ == "__main__":
+    main()
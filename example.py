@@ -11,7 +11,7 @@ if __name__ == "__main__":
     jobs_waiting = [InfiniteJob() for _ in range(waiting)]
     scheduler = Scheduler(pool_size=active)
     scheduler.run()
-    [scheduler.schedule(job) for job in [*jobs_active, *jobs_waiting]]
+    scheduler.schedule_many([*jobs_active, *jobs_waiting])
     scheduler.stop()
 
     with open("scheduler.lock", "r") as file:
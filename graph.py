@@ -0,0 +1,101 @@
+import logging
+
+from jobs import Job
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyCycleError(RuntimeError):
+    """Job dependencies form a cycle"""
+
+    pass
+
+
+class JobGraph:
+    """Dependency graph of scheduled jobs
+
+    Keeps in-degree counters for jobs waiting on unfinished dependencies
+    Each edge is visited once on `add()` and once on `finish()`
+    """
+
+    def __init__(self):
+        self.jobs: set[Job] = set()
+        self.dependents: dict[Job, list[Job]] = {}
+        self.in_degree: dict[Job, int] = {}
+
+    def __contains__(self, job: Job) -> bool:
+        return job in self.jobs
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    @property
+    def blocked(self) -> list[Job]:
+        """Jobs waiting for their dependencies"""
+        return list(self.in_degree)
+
+    def add(self, task: Job) -> list[Job]:
+        """Registers task with its unscheduled dependencies
+
+        Skips jobs which are already scheduled or finished
+        Returns registered jobs in topological order, dependencies first
+        Raises DependencyCycleError if dependencies form a cycle
+        """
+        if task in self.jobs:
+            logger.warning("Job %s is already scheduled", task)
+            return []
+        order = []
+        visiting = set()
+        visited = set()
+        stack = [(task, iter(task.dependencies))]
+        visiting.add(task)
+        while stack:
+            job, dependencies = stack[-1]
+            for dependency in dependencies:
+                if dependency in visiting:
+                    raise DependencyCycleError(
+                        f"Job {dependency} depends on itself"
+                    )
+                if (
+                    dependency in visited
+                    or dependency in self.jobs
+                    or dependency.is_finished
+                ):
+                    continue
+                visiting.add(dependency)
+                stack.append((dependency, iter(dependency.dependencies)))
+                break
+            else:
+                stack.pop()
+                visiting.discard(job)
+                visited.add(job)
+                order.append(job)
+        for job in order:
+            self.jobs.add(job)
+            pending = [
+                dependency
+                for dependency in job.dependencies
+                if dependency in self.jobs
+            ]
+            for dependency in pending:
+                self.dependents.setdefault(dependency, []).append(job)
+            if pending:
+                self.in_degree[job] = len(pending)
+        return order
+
+    def is_ready(self, job: Job) -> bool:
+        return job not in self.in_degree
+
+    def finish(self, job: Job) -> list[Job]:
+        """Removes finished job
+
+        Returns dependents which have no unfinished dependencies left
+        """
+        self.jobs.discard(job)
+        ready = []
+        for dependent in self.dependents.pop(job, []):
+            self.in_degree[dependent] -= 1
+            if self.in_degree[dependent] == 0:
+                del self.in_degree[dependent]
+                ready.append(dependent)
+        return ready
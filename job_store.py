@@ -0,0 +1,230 @@
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from enum import Enum
+from typing import Iterator
+
+from graph import JobGraph
+from jobs import Codec, Job, JobType, JsonCodec, restore_jobs
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid TEXT NOT NULL UNIQUE,
+    state BLOB NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    start_at REAL NOT NULL,
+    tries_left INTEGER NOT NULL,
+    owner TEXT,
+    lease_until REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS dependencies (
+    uid TEXT NOT NULL,
+    dependency TEXT NOT NULL,
+    PRIMARY KEY (uid, dependency)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, start_at);
+"""
+CLAIMABLE = """
+SELECT uid, state, status, tries_left FROM jobs AS job
+WHERE (
+    status = 'pending'
+    OR (status = 'leased' AND lease_until < :now)
+)
+AND start_at <= :now
+AND NOT EXISTS (
+    SELECT 1 FROM dependencies
+    JOIN jobs AS dependency ON dependency.uid = dependencies.dependency
+    WHERE dependencies.uid = job.uid AND dependency.status != 'finished'
+)
+ORDER BY priority DESC, seq
+LIMIT :limit
+"""
+
+
+class Status(str, Enum):
+    PENDING = "pending"
+    LEASED = "leased"
+    FINISHED = "finished"
+
+
+class JobStore:
+    """Jobs shared by scheduler processes in an SQLite file
+
+    Worker claims a ready job with a lease and renews it while the job
+    runs, job of a worker which died is claimed again once the lease
+    expires, spending one of its tries
+    Job is ready when it is due and its dependencies are finished
+    Every process opens its own store
+    """
+
+    def __init__(
+        self,
+        path: str = "scheduler.db",
+        *,
+        timeout: float = 30,
+        codec: Codec | None = None,
+    ):
+        self.path = path
+        self.codec = codec or JsonCodec()
+        self.connection = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, task: Job) -> list[Job]:
+        """Stores task with its unfinished dependencies
+
+        Skips jobs which are already stored
+        Returns stored jobs, dependencies first
+        Raises DependencyCycleError if dependencies form a cycle,
+        nothing is stored then
+        """
+        jobs = JobGraph().add(task)
+        with self.__transaction():
+            for job in jobs:
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO jobs"
+                    " (uid, state, status, priority, start_at, tries_left)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        job.uid,
+                        self.codec.dumps(job.serialize()),
+                        Status.PENDING.value,
+                        job.priority,
+                        job.time_start.timestamp(),
+                        job.tries_left,
+                    ),
+                )
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO dependencies VALUES (?, ?)",
+                    [
+                        (job.uid, dependency.uid)
+                        for dependency in job.dependencies
+                        if not dependency.is_finished
+                    ],
+                )
+        return jobs
+
+    def claim(
+        self,
+        owner: str,
+        limit: int,
+        lease: float,
+        job_types: dict[JobType, type[Job]],
+    ) -> list[Job]:
+        """Leases up to `limit` ready jobs to `owner`
+
+        Expired lease of a job with no tries left finishes it
+        Returns restored jobs, their dependencies are finished,
+        so they are dropped
+        """
+        now = time.time()
+        claimed = []
+        with self.__transaction():
+            rows = self.connection.execute(
+                CLAIMABLE, {"now": now, "limit": limit}
+            ).fetchall()
+            for uid, state, status, tries_left in rows:
+                if status == Status.LEASED:
+                    if tries_left <= 0:
+                        logger.info("store: job %s lease expired", uid)
+                        self.__finish(uid, "Lease expired, no tries left")
+                        continue
+                    logger.info("store: job %s is handed over", uid)
+                    tries_left -= 1
+                self.connection.execute(
+                    "UPDATE jobs SET status = ?, owner = ?, lease_until = ?,"
+                    " tries_left = ? WHERE uid = ?",
+                    (Status.LEASED.value, owner, now + lease, tries_left, uid),
+                )
+                claimed.append((state, tries_left))
+        jobs = []
+        for state, tries_left in claimed:
+            [job] = restore_jobs([self.codec.loads(state)], job_types)
+            job.tries_left = tries_left
+            jobs.append(job)
+        return jobs
+
+    def renew(self, owner: str, lease: float) -> int:
+        """Extends leases of `owner`, returns the number of its jobs"""
+        cursor = self.connection.execute(
+            "UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = ?",
+            (time.time() + lease, owner, Status.LEASED.value),
+        )
+        return cursor.rowcount
+
+    def release(self, owner: str):
+        """Returns jobs of a stopped worker without spending tries"""
+        self.connection.execute(
+            "UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL"
+            " WHERE owner = ? AND status = ?",
+            (Status.PENDING.value, owner, Status.LEASED.value),
+        )
+
+    def finish(self, uid: str, owner: str, error: BaseException | None):
+        """Marks job of `owner` finished
+
+        Ignored if the lease was lost and job was handed over
+        """
+        cursor = self.connection.execute(
+            "UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL,"
+            " error = ? WHERE uid = ? AND owner = ? AND status = ?",
+            (
+                Status.FINISHED.value,
+                None if error is None else repr(error),
+                uid,
+                owner,
+                Status.LEASED.value,
+            ),
+        )
+        if cursor.rowcount == 0:
+            logger.warning("store: job %s was handed over", uid)
+
+    def status(self, uid: str) -> tuple[Status, str | None]:
+        """Returns job status and error of a failed job
+
+        Raises KeyError if job is not stored
+        """
+        row = self.connection.execute(
+            "SELECT status, error FROM jobs WHERE uid = ?", (uid,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(uid)
+        return Status(row[0]), row[1]
+
+    def unfinished(self) -> int:
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status != ?",
+            (Status.FINISHED.value,),
+        ).fetchone()[0]
+
+    def __finish(self, uid: str, error: str | None):
+        self.connection.execute(
+            "UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL,"
+            " error = ? WHERE uid = ?",
+            (Status.FINISHED.value, error, uid),
+        )
+
+    @contextmanager
+    def __transaction(self) -> Iterator[None]:
+        """Write transaction which locks the store right away,
+        so that two workers never claim the same job
+        """
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
@@ -1,6 +1,19 @@
+from .async_job import AsyncJob
+from .cache import ResultCache
+from .channel import Channel
+from .clock import DEFAULT_CLOCK, Clock, ManualClock
+from .codecs import BinaryCodec, Codec, Extension, JsonCodec, restore_jobs
 from .constants import JobType
-from .file_job import FileJob
-from .job import EmptyJob, InfiniteJob, Job
+from .file_job import AsyncFileJob, FileJob, ReadMode
+from .job import (
+    EmptyJob,
+    InfiniteJob,
+    Job,
+    JobFailed,
+    Park,
+    StepStats,
+)
+from .retry import CircuitBreaker, CircuitOpen, RetryPolicy
 from .system_job import SystemAction, SystemJob
-from .web_job import WebJob
-from .types import JOB_TYPES
+from .web_job import AsyncWebJob, HttpSession, WebJob
+from .types import ASYNC_JOB_TYPES, JOB_TYPES
@@ -0,0 +1,57 @@
+import inspect
+import logging
+from typing import Any, Awaitable
+
+from .job import Job, JobNotReady, JobSoftReset, Park
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncJob(Job):
+    """Job prototype for the asyncio scheduler
+
+    `target()` may be an async generator awaiting real I/O
+    or a plain generator, which is iterated synchronously
+    """
+
+    __slots__ = ()
+
+    async def arun(self):
+        self.parked_on = None
+        try:
+            if not self.is_finished:
+                start = self.clock.monotonic()
+                result = self._next_step()
+                if inspect.isasyncgen(self.coro):
+                    result = await result
+                timed = self.clock.monotonic() - start
+                self.time_since_start += timed
+                self._record_step(timed)
+                self._check_time_left()
+                if isinstance(result, Park):
+                    self.parked_on = result
+        except JobSoftReset:
+            self.soft_reset()
+            self._back_off()
+        except (StopIteration, StopAsyncIteration):
+            self.is_finished = True
+        except Exception as error:
+            logger.exception(error)
+            if self.error is None and not isinstance(error, JobNotReady):
+                self.error = error
+        finally:
+            self._save_state()
+
+    @Job.check_start_ready
+    @Job.check_timeout
+    def _next_step(self) -> Awaitable | Any:
+        coro = self._generator()
+        if inspect.isasyncgen(coro):
+            return coro.__anext__()
+        return coro.send(None)
+
+    def target(self):
+        raise NotImplementedError(
+            f"Method {self.__class__}.target()"
+            f" should be implemented as an async generator function"
+        )
@@ -0,0 +1,173 @@
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import partial
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+MAX_SIZE = 64 * 1024 * 1024
+TTL = 60.0
+
+
+class CacheEntry:
+    __slots__ = ("value", "size", "validators", "stored_at")
+
+    def __init__(
+        self,
+        value: Any,
+        size: int,
+        validators: dict[str, Any],
+        stored_at: float,
+    ):
+        self.value = value
+        self.size = size
+        self.validators = validators
+        self.stored_at = stored_at
+
+
+class ResultCache:
+    """Results of idempotent job work shared by jobs
+
+    Entries are kept by key, such as job type and url or file path,
+    with validators telling whether the result is still valid
+    Entries older than `ttl` seconds are stale: they are revalidated
+    or loaded again
+    Least recently used entries are evicted once entries take more
+    than `max_size` bytes
+    Identical work in flight is coalesced, so that only one job does it
+    and the others receive its result
+    """
+
+    def __init__(
+        self,
+        max_size: int = MAX_SIZE,
+        ttl: float = TTL,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self.in_flight: dict[Hashable, Future] = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def lookup(self, key: Hashable) -> CacheEntry | None:
+        """Returns entry, fresh or stale, marking it recently used"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return self.clock() - entry.stored_at < self.ttl
+
+    def hit(self, entry: CacheEntry | None) -> bool:
+        """Counts lookup result, returns True if entry is fresh"""
+        fresh = entry is not None and self.is_fresh(entry)
+        with self.lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return fresh
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        size: int,
+        validators: dict[str, Any] | None = None,
+    ):
+        """Stores result, evicting least recently used entries
+
+        Result larger than the cache is not stored
+        """
+        with self.lock:
+            self.__remove(key)
+            if size > self.max_size:
+                return
+            self.entries[key] = CacheEntry(
+                value, size, validators or {}, self.clock()
+            )
+            self.size += size
+            while self.size > self.max_size:
+                evicted, entry = self.entries.popitem(last=False)
+                self.size -= entry.size
+                logger.debug("cache: %s evicted", evicted)
+
+    def touch(self, key: Hashable):
+        """Marks entry fresh again after it was revalidated"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry.stored_at = self.clock()
+
+    def coalesce(self, key: Hashable, start: Callable[[], Future]) -> Future:
+        """Returns future of the work in flight for the key
+
+        Calls `start` to begin the work if there is none
+        """
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self.in_flight[key] = start()
+        future.add_done_callback(partial(self.__landed, key))
+        return future
+
+    def load(
+        self,
+        key: Hashable,
+        validators: dict[str, Any],
+        load: Callable[[], Any],
+        size: Callable[[Any], int] = len,
+    ) -> Any:
+        """Returns fresh result with the same validators or loads it
+
+        Waits for the same load in flight instead of loading again
+        """
+        entry = self.lookup(key)
+        if entry is not None and entry.validators != validators:
+            entry = None
+        if self.hit(entry):
+            return entry.value
+        leader = Future()
+        future = self.coalesce(key, lambda: leader)
+        if future is not leader:
+            return future.result()
+        try:
+            value = load()
+        except BaseException as error:
+            leader.set_exception(error)
+            raise
+        self.put(key, value, size(value), validators)
+        leader.set_result(value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def __remove(self, key: Hashable):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def __landed(self, key: Hashable, future: Future):
+        with self.lock:
+            if self.in_flight.get(key) is future:
+                del self.in_flight[key]
@@ -0,0 +1,77 @@
+from queue import Queue
+from typing import Any, Callable
+
+from .job import Park
+
+
+class ChannelPark(Park):
+    """Waits until channel has a free slot or an item"""
+
+    def __init__(self, channel: "Channel", writable: bool):
+        self.channel = channel
+        self.writable = writable
+
+    def subscribe(self, wake: Callable[[], None]) -> bool:
+        return self.channel.subscribe(wake, self.writable)
+
+
+class Channel(Queue):
+    """Bounded queue connecting pipeline jobs
+
+    Producer yields `channel.writable()` instead of blocking on a full channel,
+    consumer yields `channel.readable()` on an empty one
+    Scheduler parks such jobs until another job gets or puts an item
+    """
+
+    def __init__(self, maxsize: int):
+        if maxsize <= 0:
+            raise ValueError("Channel size should be positive")
+        super().__init__(maxsize)
+        self.closed = False
+        self.readers: list[Callable[[], None]] = []
+        self.writers: list[Callable[[], None]] = []
+
+    def put(self, item: Any, block: bool = True, timeout: float = None):
+        super().put(item, block, timeout)
+        self.__notify(self.readers)
+
+    def get(self, block: bool = True, timeout: float = None) -> Any:
+        item = super().get(block, timeout)
+        self.__notify(self.writers)
+        return item
+
+    def close(self):
+        """Tells consumers that no more items will be put"""
+        with self.mutex:
+            self.closed = True
+        self.__notify(self.readers)
+        self.__notify(self.writers)
+
+    def writable(self) -> ChannelPark:
+        return ChannelPark(self, writable=True)
+
+    def readable(self) -> ChannelPark:
+        return ChannelPark(self, writable=False)
+
+    def subscribe(self, wake: Callable[[], None], writable: bool) -> bool:
+        with self.mutex:
+            if self.closed:
+                return False
+            if writable and self._qsize() < self.maxsize:
+                return False
+            if not writable and self._qsize() > 0:
+                return False
+            (self.writers if writable else self.readers).append(wake)
+            return True
+
+    def __notify(self, waiters: list[Callable[[], None]]):
+        with self.mutex:
+            callbacks = waiters[:]
+            waiters.clear()
+        for wake in callbacks:
+            wake()
+
+
+def writable(queue: Queue) -> Park | None:
+    """Value to yield while the queue is full"""
+    return queue.writable() if isinstance(queue, Channel) else None
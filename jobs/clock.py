@@ -0,0 +1,69 @@
+import time
+from datetime import datetime, timedelta, tzinfo
+from typing import Callable
+
+import pytz
+
+TIMEZONE = "Europe/Moscow"
+
+
+class Clock:
+    """Time source of jobs and schedulers
+
+    `now()` is time zone aware wall time, the time zone is resolved once
+    `monotonic()` measures durations
+    """
+
+    def __init__(self, tz: str | tzinfo = TIMEZONE):
+        self.tz = pytz.timezone(tz) if isinstance(tz, str) else tz
+
+    def now(self) -> datetime:
+        return datetime.now(self.tz)
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def subscribe(self, callback: Callable[[], None]):
+        """Registers callback called when time jumps forward
+
+        Real time never jumps, so it is never called
+        """
+        pass
+
+
+class ManualClock(Clock):
+    """Clock which moves only when `advance()` is called
+
+    Lets tests fast-forward delayed starts and timeouts
+    """
+
+    def __init__(
+        self, start: datetime | None = None, tz: str | tzinfo = TIMEZONE
+    ):
+        super().__init__(tz)
+        self.start = start or super().now()
+        self.elapsed = 0.0
+        self.callbacks: list[Callable[[], None]] = []
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.elapsed)
+
+    def monotonic(self) -> float:
+        return self.elapsed
+
+    def subscribe(self, callback: Callable[[], None]):
+        self.callbacks.append(callback)
+
+    def advance(self, seconds: float):
+        self.elapsed += seconds
+        for callback in self.callbacks:
+            callback()
+
+    def __getstate__(self):
+        """Callbacks belong to the scheduler process"""
+        state = self.__dict__.copy()
+        state["callbacks"] = []
+        return state
+
+
+DEFAULT_CLOCK = Clock()
@@ -0,0 +1,452 @@
+import base64
+import json
+import logging
+import struct
+from dataclasses import dataclass
+from datetime import datetime
+from queue import Queue
+from typing import IO, Any, Callable, Iterable, Iterator
+
+from .channel import Channel
+from .constants import JobType
+from .job import Job
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Extension:
+    """Maps values of `klass` to data the wire format can hold
+
+    `tag` names the value in JSON, `code` is its binary ext type
+    `decode` receives the payload and references shared by one load
+    """
+
+    tag: str
+    code: int
+    klass: type | tuple[type, ...]
+    encode: Callable[[Any], Any]
+    decode: Callable[[Any, dict[Any, Any]], Any]
+
+
+def encode_queue(queue: Queue) -> list[Any]:
+    """Queues are shared by jobs, so they are stored with an identity"""
+    closed = queue.closed if isinstance(queue, Channel) else None
+    return [id(queue), queue.maxsize, closed, list(queue.queue)]
+
+
+def decode_queue(payload: list[Any], refs: dict[Any, Any]) -> Queue:
+    token, maxsize, closed, items = payload
+    key = ("queue", token)
+    if key not in refs:
+        if closed is None:
+            queue = Queue(maxsize)
+        else:
+            queue = Channel(maxsize)
+            queue.closed = closed
+        for item in items:
+            queue.put_nowait(item)
+        refs[key] = queue
+    return refs[key]
+
+
+DEFAULT_EXTENSIONS = [
+    Extension(
+        "datetime",
+        1,
+        datetime,
+        datetime.isoformat,
+        lambda payload, refs: datetime.fromisoformat(payload),
+    ),
+    Extension(
+        "job",
+        2,
+        Job,
+        lambda job: job.uid,
+        lambda payload, refs: payload,
+    ),
+    Extension("queue", 3, Queue, encode_queue, decode_queue),
+    Extension(
+        "bytes",
+        4,
+        (bytes, bytearray, memoryview),
+        lambda value: base64.b64encode(value).decode(),
+        lambda payload, refs: base64.b64decode(payload),
+    ),
+]
+
+
+class Codec:
+    """Converts job states to bytes and back
+
+    Subclasses define the wire format, extensions map values the format
+    can not hold: datetimes, dependencies by job id and shared queues
+    Values without an extension are stored as None
+    """
+
+    def __init__(self, extensions: list[Extension] | None = None):
+        self.extensions = list(DEFAULT_EXTENSIONS)
+        for extension in extensions or []:
+            self.register(extension)
+
+    def register(self, extension: Extension):
+        """Adds extension, it takes precedence over registered ones"""
+        self.extensions.insert(0, extension)
+
+    def to_ext(self, value: Any) -> tuple[Extension, Any] | None:
+        for extension in self.extensions:
+            if isinstance(value, extension.klass):
+                return extension, extension.encode(value)
+        logger.warning("Can not encode %s, it is dropped", type(value))
+        return None
+
+    def dumps(self, value: Any) -> bytes:
+        raise NotImplementedError(
+            f"Method {self.__class__}.dumps() should be implemented"
+        )
+
+    def loads(self, data: bytes, refs: dict[Any, Any] | None = None) -> Any:
+        raise NotImplementedError(
+            f"Method {self.__class__}.loads() should be implemented"
+        )
+
+    def write_record(self, file: IO[bytes], value: Any):
+        """Appends one framed record"""
+        raise NotImplementedError(
+            f"Method {self.__class__}.write_record() should be implemented"
+        )
+
+    def read_records(
+        self, file: IO[bytes], refs: dict[Any, Any] | None = None
+    ) -> Iterator[Any]:
+        """Reads framed records one at a time
+
+        Stops at a partial record left by a crash
+        """
+        raise NotImplementedError(
+            f"Method {self.__class__}.read_records() should be implemented"
+        )
+
+    def dump(self, file: IO[bytes], active: list[Job], waiting: list[Job]):
+        """Writes lock file with active and waiting job states"""
+        raise NotImplementedError(
+            f"Method {self.__class__}.dump() should be implemented"
+        )
+
+    def load(self, file: IO[bytes]) -> Iterator[dict[str, Any]]:
+        """Reads lock file job states, active jobs first"""
+        raise NotImplementedError(
+            f"Method {self.__class__}.load() should be implemented"
+        )
+
+
+class JsonCodec(Codec):
+    """Human-readable format, records are separated by new lines
+
+    Extension values are objects with the only `__<tag>__` key
+    """
+
+    def __init__(self, extensions: list[Extension] | None = None):
+        super().__init__(extensions)
+        self.encoder = json.JSONEncoder(default=self.__default)
+
+    def dumps(self, value: Any) -> bytes:
+        return self.encoder.encode(value).encode()
+
+    def loads(self, data: bytes, refs: dict[Any, Any] | None = None) -> Any:
+        return json.loads(data, object_hook=self.__object_hook(refs))
+
+    def write_record(self, file: IO[bytes], value: Any):
+        file.write(self.dumps(value) + b"\n")
+
+    def read_records(
+        self, file: IO[bytes], refs: dict[Any, Any] | None = None
+    ) -> Iterator[Any]:
+        decoder = json.JSONDecoder(object_hook=self.__object_hook(refs))
+        for line in file:
+            try:
+                yield decoder.decode(line.decode())
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                logger.warning("Records end with a partial record")
+                return
+
+    def dump(self, file: IO[bytes], active: list[Job], waiting: list[Job]):
+        file.write(
+            self.dumps(
+                {
+                    "active": [job.serialize() for job in active],
+                    "waiting": [job.serialize() for job in waiting],
+                }
+            )
+        )
+
+    def load(self, file: IO[bytes]) -> Iterator[dict[str, Any]]:
+        data = self.loads(file.read())
+        yield from data.get("active", [])
+        yield from data.get("waiting", [])
+
+    def __default(self, value: Any) -> Any:
+        ext = self.to_ext(value)
+        if ext is None:
+            return None
+        extension, payload = ext
+        return {f"__{extension.tag}__": payload}
+
+    def __object_hook(
+        self, refs: dict[Any, Any] | None
+    ) -> Callable[[dict[str, Any]], Any]:
+        tags = {f"__{ext.tag}__": ext for ext in self.extensions}
+        refs = {} if refs is None else refs
+
+        def object_hook(value: dict[str, Any]) -> Any:
+            if len(value) == 1:
+                key = next(iter(value))
+                if key in tags:
+                    return tags[key].decode(value[key], refs)
+            return value
+
+        return object_hook
+
+
+NIL = 0xC0
+FALSE = 0xC2
+TRUE = 0xC3
+BIN32 = 0xC6
+EXT32 = 0xC9
+FLOAT64 = 0xCB
+INT64 = 0xD3
+STR32 = 0xDB
+ARRAY32 = 0xDD
+MAP32 = 0xDF
+CONSTANTS = {NIL: None, FALSE: False, TRUE: True}
+CONSTANT_HEADS = {value: head for head, value in CONSTANTS.items()}
+
+HEAD = struct.Struct(">BI")
+EXT_HEAD = struct.Struct(">BIb")
+NUMBER = {INT64: struct.Struct(">Bq"), FLOAT64: struct.Struct(">Bd")}
+FRAME = struct.Struct(">I")
+MAGIC = b"JOBS\x01"
+
+
+class BinaryCodec(Codec):
+    """Compact format, a subset of MessagePack
+
+    Small integers, short strings, arrays and maps take one header byte
+    Records are prefixed with their length, so a lock file is read
+    and decoded one job at a time
+    """
+
+    def dumps(self, value: Any) -> bytes:
+        buffer = bytearray()
+        self.__pack(value, buffer)
+        return bytes(buffer)
+
+    def loads(self, data: bytes, refs: dict[Any, Any] | None = None) -> Any:
+        codes = {ext.code: ext for ext in self.extensions}
+        value, _ = self.__unpack(
+            memoryview(data), 0, codes, {} if refs is None else refs
+        )
+        return value
+
+    def write_record(self, file: IO[bytes], value: Any):
+        data = self.dumps(value)
+        file.write(FRAME.pack(len(data)) + data)
+
+    def read_records(
+        self, file: IO[bytes], refs: dict[Any, Any] | None = None
+    ) -> Iterator[Any]:
+        refs = {} if refs is None else refs
+        while header := file.read(FRAME.size):
+            data = b""
+            if len(header) == FRAME.size:
+                (size,) = FRAME.unpack(header)
+                data = file.read(size)
+            if len(header) != FRAME.size or len(data) != size:
+                logger.warning("Records end with a partial record")
+                return
+            yield self.loads(data, refs)
+
+    def dump(self, file: IO[bytes], active: list[Job], waiting: list[Job]):
+        file.write(MAGIC)
+        header = {"active": len(active), "waiting": len(waiting)}
+        self.write_record(file, header)
+        schemas = {}
+        for job in [*active, *waiting]:
+            state = job.serialize()
+            body = state["task_body"]
+            key = (state["type"], tuple(body))
+            if key not in schemas:
+                schemas[key] = len(schemas)
+                schema = {"schema": schemas[key], "type": state["type"]}
+                self.write_record(file, {**schema, "fields": list(body)})
+            self.write_record(file, [schemas[key], list(body.values())])
+
+    def load(self, file: IO[bytes]) -> Iterator[dict[str, Any]]:
+        """Reads job states written by `dump()`
+
+        Field names of each job type are written once as a schema record,
+        job records hold values only
+        """
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a binary lock file")
+        records = self.read_records(file)
+        next(records, None)
+        schemas = {}
+        for record in records:
+            if isinstance(record, dict):
+                schemas[record["schema"]] = record
+                continue
+            schema_id, values = record
+            schema = schemas[schema_id]
+            yield {
+                "type": schema["type"],
+                "task_body": dict(zip(schema["fields"], values)),
+            }
+
+    def __pack(self, value: Any, buffer: bytearray):
+        if value is None or isinstance(value, bool):
+            buffer.append(CONSTANT_HEADS[value])
+        elif isinstance(value, str):
+            self.__pack_str(value, buffer)
+        elif isinstance(value, int):
+            self.__pack_int(value, buffer)
+        elif isinstance(value, float):
+            buffer += NUMBER[FLOAT64].pack(FLOAT64, value)
+        elif isinstance(value, dict):
+            self.__pack_map(value, buffer)
+        elif isinstance(value, (list, tuple)):
+            self.__pack_array(value, buffer)
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            buffer += HEAD.pack(BIN32, len(value))
+            buffer += value
+        else:
+            self.__pack_ext(value, buffer)
+
+    def __pack_str(self, value: str, buffer: bytearray):
+        data = value.encode()
+        if len(data) < 32:
+            buffer.append(0xA0 | len(data))
+        else:
+            buffer += HEAD.pack(STR32, len(data))
+        buffer += data
+
+    def __pack_int(self, value: int, buffer: bytearray):
+        if 0 <= value < 128:
+            buffer.append(value)
+        elif -32 <= value < 0:
+            buffer.append(value & 0xFF)
+        else:
+            buffer += NUMBER[INT64].pack(INT64, value)
+
+    def __pack_map(self, value: dict[Any, Any], buffer: bytearray):
+        if len(value) < 16:
+            buffer.append(0x80 | len(value))
+        else:
+            buffer += HEAD.pack(MAP32, len(value))
+        for key, item in value.items():
+            self.__pack(key, buffer)
+            self.__pack(item, buffer)
+
+    def __pack_array(self, value: list[Any] | tuple, buffer: bytearray):
+        if len(value) < 16:
+            buffer.append(0x90 | len(value))
+        else:
+            buffer += HEAD.pack(ARRAY32, len(value))
+        for item in value:
+            self.__pack(item, buffer)
+
+    def __pack_ext(self, value: Any, buffer: bytearray):
+        ext = self.to_ext(value)
+        if ext is None:
+            buffer.append(NIL)
+            return
+        extension, payload = ext
+        data = self.dumps(payload)
+        buffer += EXT_HEAD.pack(EXT32, len(data), extension.code)
+        buffer += data
+
+    def __unpack(
+        self,
+        data: memoryview,
+        offset: int,
+        codes: dict[int, Extension],
+        refs: dict[Any, Any],
+    ) -> tuple[Any, int]:
+        head = data[offset]
+        offset += 1
+        if head < 0x80:
+            return head, offset
+        if head >= 0xE0:
+            return head - 0x100, offset
+        if head < NIL:
+            return self.__unpack_fixed(head, data, offset, codes, refs)
+        if head in CONSTANTS:
+            return CONSTANTS[head], offset
+        if head in NUMBER:
+            (value,) = NUMBER[head].unpack_from(data, offset - 1)[1:]
+            return value, offset + NUMBER[head].size - 1
+        (size,) = FRAME.unpack_from(data, offset)
+        offset += FRAME.size
+        return self.__unpack_sized(head, data, offset, size, codes, refs)
+
+    def __unpack_fixed(self, head, data, offset, codes, refs):
+        """Unpacks map, array or string with its size in the header"""
+        if head < 0x90:
+            return self.__unpack_map(data, offset, head & 0x0F, codes, refs)
+        if head < 0xA0:
+            return self.__unpack_array(data, offset, head & 0x0F, codes, refs)
+        end = offset + (head & 0x1F)
+        return str(data[offset:end], "utf-8"), end
+
+    def __unpack_sized(self, head, data, offset, size, codes, refs):
+        """Unpacks value with its size after the header"""
+        end = offset + size
+        if head == STR32:
+            return str(data[offset:end], "utf-8"), end
+        if head == BIN32:
+            return bytes(data[offset:end]), end
+        if head == MAP32:
+            return self.__unpack_map(data, offset, size, codes, refs)
+        if head == ARRAY32:
+            return self.__unpack_array(data, offset, size, codes, refs)
+        if head == EXT32:
+            extension = codes[struct.unpack_from(">b", data, offset)[0]]
+            payload, offset = self.__unpack(data, offset + 1, codes, refs)
+            return extension.decode(payload, refs), offset
+        raise ValueError(f"Unknown type header {head:#x}")
+
+    def __unpack_map(self, data, offset, size, codes, refs):
+        value = {}
+        for _ in range(size):
+            key, offset = self.__unpack(data, offset, codes, refs)
+            value[key], offset = self.__unpack(data, offset, codes, refs)
+        return value, offset
+
+    def __unpack_array(self, data, offset, size, codes, refs):
+        value = []
+        for _ in range(size):
+            item, offset = self.__unpack(data, offset, codes, refs)
+            value.append(item)
+        return value, offset
+
+
+def restore_jobs(
+    states: Iterable[dict[str, Any]], job_types: dict[JobType, type[Job]]
+) -> Iterator[Job]:
+    """Creates jobs from decoded states one at a time
+
+    States come dependencies first, so dependency ids are resolved
+    against jobs restored before, ids of finished jobs are dropped
+    """
+    restored: dict[str, Job] = {}
+    for state in states:
+        body = dict(state["task_body"])
+        dependencies = [
+            restored[uid]
+            for uid in body.pop("dependencies", None) or []
+            if uid in restored
+        ]
+        job_klass = job_types.get(state["type"], Job)
+        job = job_klass(**body, dependencies=dependencies)
+        restored[job.uid] = job
+        yield job
@@ -1,51 +1,288 @@
+import asyncio
 import logging
+import mmap
 import os
+import time
 from dataclasses import dataclass
-from queue import Queue
-from typing import Any, ClassVar
+from enum import Enum
+from queue import Empty, Queue
+from typing import IO, Any, ClassVar
 
+from .async_job import AsyncJob
+from .cache import ResultCache
+from .channel import writable
 from .constants import JobType
 from .job import Job, JobMomento
 
 logger = logging.getLogger(__name__)
 
+BUFFER_SIZE = 64 * 1024
+FLUSH_INTERVAL = 1.0
+READ_SIZE = 64 * 1024
+READ_END = object()
+
+
+class ReadMode(str, Enum):
+    """How "r" actions hand file content to the queue"""
+
+    WHOLE = "whole"
+    CHUNKS = "chunks"
+    LINES = "lines"
+    MMAP = "mmap"
+
+
+class FileBuffer:
+    """File kept open between job iterations with its pending writes"""
+
+    def __init__(self, filename: str, filemode: str):
+        self.file: IO[bytes] = open(file=filename, mode=filemode + "b")
+        self.items: list[bytes] = []
+        self.size = 0
+        self.flushed_at = time.monotonic()
+
+    def write(self, items: list[Any]):
+        for item in items:
+            if isinstance(item, str):
+                item = item.encode()
+            self.items.append(item)
+            self.size += len(item)
+
+    def flush(self):
+        if self.items:
+            self.file.writelines(self.items)
+            self.items = []
+            self.size = 0
+        self.file.flush()
+        self.flushed_at = time.monotonic()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.file.close()
+
 
 @dataclass
 class FileJobMomento(JobMomento):
     TYPE: ClassVar[JobType] = JobType.FILE
     actions: list[tuple[str, Any]]
     queue: Queue
+    buffered: bool
+    buffer_size: int
+    flush_interval: float
+    read_mode: ReadMode
+    read_size: int
 
 
 class FileJob(Job):
     def __init__(
-        self, actions: list[tuple[str, Any]], queue: Queue, *args, **kwargs
+        self,
+        actions: list[tuple[str, Any]],
+        queue: Queue,
+        *args,
+        buffered: bool = False,
+        buffer_size: int = BUFFER_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        read_mode: ReadMode = ReadMode.WHOLE,
+        read_size: int = READ_SIZE,
+        cache: ResultCache | None = None,
+        **kwargs,
     ):
+        """File Job
+
+        `buffered` keeps files open between iterations,
+        each write action takes all available queue items
+        Writes are flushed when `buffer_size` bytes are pending,
+        `flush_interval` seconds passed, or job is stopped or done
+        `read_mode` other than WHOLE reads files over several iterations:
+        by `read_size` bytes, by lines or as `memoryview` slices of
+        a memory-mapped file, waiting while the queue is full
+        `cache` shares WHOLE reads of unchanged files between jobs,
+        scheduler cache is used unless it is set explicitly
+        """
         self.actions = actions
         self.queue = queue
+        self.buffered = buffered
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.read_mode = ReadMode(read_mode)
+        self.read_size = read_size
+        self.cache = cache
+        self.buffers: dict[str, FileBuffer] = {}
+        self.mappings: list[mmap.mmap] = []
         super().__init__(*args, **kwargs)
 
     def create_momento(self, defaults: dict[str, Any]):
         return FileJobMomento(
-            **defaults, actions=self.actions, queue=self.queue
+            **defaults,
+            actions=self.actions,
+            queue=self.queue,
+            buffered=self.buffered,
+            buffer_size=self.buffer_size,
+            flush_interval=self.flush_interval,
+            read_mode=self.read_mode,
+            read_size=self.read_size,
         )
 
+    def attach(self, scheduler):
+        super().attach(scheduler)
+        if self.cache is None:
+            self.cache = getattr(scheduler, "cache", None)
+
     def target(self):
-        for filemode, filename in self.actions:
+        try:
+            for filemode, filename in self.actions:
+                try:
+                    if filemode == "r" and self.read_mode != ReadMode.WHOLE:
+                        yield from self.iter_read(filename)
+                        continue
+                    self.apply(filemode, filename)
+                except RuntimeError as error:
+                    logger.error(error)
+                yield
+        finally:
+            self.close_files()
+
+    def apply(self, filemode: str, filename: str):
+        """Executes one file action"""
+        if filemode in ("w", "a") and self.buffered:
+            self.write_buffered(filemode, filename)
+        elif filemode in ("w", "a"):
+            item = None if self.queue.empty() else self.queue.get()
+            if isinstance(item, (bytes, bytearray, memoryview)):
+                filemode += "b"
+            with open(file=filename, mode=filemode) as file:
+                if item is not None:
+                    file.write(item)
+        elif filemode == "r":
+            self.check_readable(filename)
+            self.queue.put(self.read(filename))
+        else:
+            logger.warning(f"Filemode `%s` is not supported", filemode)
+
+    def check_readable(self, filename: str):
+        if not os.path.exists(filename):
+            raise RuntimeError(
+                f"Cannot read file {filename}: the file is missing"
+            )
+        if filename in self.buffers:
+            self.buffers[filename].flush()
+
+    def read(self, filename: str) -> str:
+        """Reads the whole file, from the cache if it is unchanged
+
+        File is unchanged while its modification time and size are,
+        the cached text takes the file size in bytes
+        """
+
+        def load() -> str:
+            with open(file=filename, mode="r") as file:
+                return file.read()
+
+        if self.cache is None:
+            return load()
+        stat = os.stat(filename)
+        validators = {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+        key = (JobType.FILE, os.path.abspath(filename))
+        return self.cache.load(
+            key, validators, load, size=lambda _: stat.st_size
+        )
+
+    def iter_read(self, filename: str):
+        """Puts file parts to the queue one per iteration
+
+        Yields the part when it is put, while the queue is full
+        yields None or a channel park
+        """
+        self.check_readable(filename)
+        for part in self.iter_parts(filename):
+            while self.queue.full():
+                yield writable(self.queue)
+            self.queue.put(part)
+            yield part
+
+    def iter_parts(self, filename: str):
+        if self.read_mode == ReadMode.LINES:
+            with open(file=filename, mode="r") as file:
+                yield from file
+        elif self.read_mode == ReadMode.MMAP:
+            if os.path.getsize(filename) == 0:
+                return
+            with open(file=filename, mode="rb") as file:
+                mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.mappings.append(mapping)
+            view = memoryview(mapping)
+            for offset in range(0, len(view), self.read_size):
+                yield view[offset : offset + self.read_size]
+        else:
+            with open(file=filename, mode="rb") as file:
+                while chunk := file.read(self.read_size):
+                    yield chunk
+
+    def write_buffered(self, filemode: str, filename: str):
+        """Drains the queue into the file buffer
+
+        File is opened once, so "w" truncates it only on the first action
+        """
+        if filename not in self.buffers:
+            self.buffers[filename] = FileBuffer(filename, filemode)
+        buffer = self.buffers[filename]
+        items = []
+        while True:
             try:
-                if filemode in ("w", "a"):
-                    with open(file=filename, mode=filemode) as file:
-                        if not self.queue.empty():
-                            file.write(self.queue.get())
-                elif filemode == "r":
-                    if not os.path.exists(filename):
-                        raise RuntimeError(
-                            f"Cannot read file {filename}: the file is missing"
-                        )
-                    with open(file=filename, mode=filemode) as file:
-                        self.queue.put(file.read())
-                else:
-                    logger.warning(f"Filemode `%s` is not supported", filemode)
-            except RuntimeError as error:
-                logger.error(error)
-            yield
+                items.append(self.queue.get_nowait())
+            except Empty:
+                break
+        buffer.write(items)
+        if (
+            buffer.size >= self.buffer_size
+            or time.monotonic() - buffer.flushed_at >= self.flush_interval
+        ):
+            buffer.flush()
+
+    def close_files(self):
+        buffers, self.buffers = self.buffers, {}
+        for buffer in buffers.values():
+            buffer.close()
+        mappings, self.mappings = self.mappings, []
+        for mapping in mappings:
+            try:
+                mapping.close()
+            except BufferError:
+                # Slices are still used downstream, mapping is closed by gc
+                pass
+
+    def stop(self):
+        self.close_files()
+        super().stop()
+
+    def release(self):
+        self.close_files()
+
+
+class AsyncFileJob(AsyncJob, FileJob):
+    """File Job for the asyncio scheduler
+
+    Blocking file operations are awaited in the default executor
+    """
+
+    async def target(self):
+        try:
+            for filemode, filename in self.actions:
+                try:
+                    if filemode == "r" and self.read_mode != ReadMode.WHOLE:
+                        parts = self.iter_read(filename)
+                        while True:
+                            part = await asyncio.to_thread(
+                                next, parts, READ_END
+                            )
+                            if part is READ_END:
+                                break
+                            yield part
+                        continue
+                    await asyncio.to_thread(self.apply, filemode, filename)
+                except RuntimeError as error:
+                    logger.error(error)
+                yield
+        finally:
+            self.close_files()
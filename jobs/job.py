@@ -1,16 +1,19 @@
 import logging
-import time
+import uuid
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from functools import wraps
-from typing import Any, ClassVar, Self
-
-import pytz
+from typing import Any, Callable, ClassVar, Self
 
+from .clock import DEFAULT_CLOCK, Clock
 from .constants import JobType
+from .retry import RetryPolicy
 
 logger = logging.getLogger(__name__)
 
+# Job type of each job class, momento type does not change per instance
+_job_types: dict[type, JobType | None] = {}
+
 
 class JobSoftReset(RuntimeError):
     """Job is reset because of internal error"""
@@ -24,6 +27,39 @@ class JobNotReady(RuntimeError):
     pass
 
 
+class JobFailed(RuntimeError):
+    """Job ran out of tries"""
+
+    pass
+
+
+class Park:
+    """Yielded by job target when it can not proceed
+
+    Scheduler stops iterating the job until the wake callback is called
+    """
+
+    def subscribe(self, wake: Callable[[], None]) -> bool:
+        """Registers wake callback
+
+        Returns False if the job can proceed right away
+        """
+        raise NotImplementedError(
+            f"Method {self.__class__}.subscribe() should be implemented"
+        )
+
+
+@dataclass(slots=True)
+class StepStats:
+    """Step timings of a job"""
+
+    steps: int = 0
+    longest: float = 0.0
+    overruns: int = 0
+    overrun_time: float = 0.0
+    cancelled: int = 0
+
+
 @dataclass
 class JobMomento:
     TYPE: ClassVar[JobType]
@@ -31,10 +67,47 @@ class JobMomento:
     max_working_time: int
     tries: int
     dependencies: list[Self]
+    uid: str
+    priority: int
 
 
 class Job:
-    """Job prototype"""
+    """Job prototype
+
+    Attributes are slotted, so that millions of queued jobs stay compact,
+    subclasses which do not declare `__slots__` get a `__dict__`
+    """
+
+    __slots__ = (
+        "uid",
+        "journal",
+        "metrics",
+        "clock",
+        "priority",
+        "demotions",
+        "quantum",
+        "stats",
+        "overran",
+        "last_step",
+        "generation",
+        "start_at",
+        "max_working_time",
+        "tries",
+        "dependencies",
+        "kwargs",
+        "tries_left",
+        "retry_policy",
+        "retry_after",
+        "coro",
+        "time_start",
+        "time_since_start",
+        "is_finished",
+        "is_ready",
+        "parked_on",
+        "error",
+        "_state_dirty",
+        "_captured_state",
+    )
 
     def __init__(
         self,
@@ -43,16 +116,43 @@ class Job:
         max_working_time: int = -1,
         tries: int = 0,
         dependencies: list[Self] = None,
+        uid: str | None = None,
+        clock: Clock | None = None,
+        priority: int = 0,
+        quantum: float | None = None,
+        retry_policy: RetryPolicy | None = None,
         **kwargs,
     ):
+        """Job
+
+        Waiting jobs with higher `priority` are started first
+        A step longer than `quantum` seconds is an overrun,
+        scheduler quantum is used by default
+        `retry_policy` delays restarts of a failed job,
+        scheduler policy is used by default, otherwise job restarts
+        right away
+        """
+        self.uid = uid or uuid.uuid4().hex
+        self.journal = None
+        self.metrics = None
+        self.clock = clock or DEFAULT_CLOCK
+        self.priority = priority
+        self.demotions = 0
+        self.quantum = quantum
+        self.stats = StepStats()
+        self.overran = False
+        self.last_step = 0.0
+        self.generation = 0
         self.start_at = start_at
         self.max_working_time = max_working_time
         self.tries = tries
         self.dependencies = dependencies or []
-        self.kwargs = kwargs
+        self.kwargs = kwargs or None
         # Prepare to run
         self.tries_left = self.tries
-        self.soft_reset()
+        self.retry_policy = retry_policy
+        self.retry_after = 0.0
+        self.soft_reset(release=False)
 
     @classmethod
     def from_momento(cls, momento: JobMomento):
@@ -64,21 +164,85 @@ class Job:
         return JobMomento(**defaults)
 
     def serialize(self):
-        return {"type": self._state.TYPE, "task_body": self._state.__dict__}
+        state = self._state
+        return {"type": state.TYPE, "task_body": state.__dict__}
+
+    def attach(self, scheduler):
+        """Called by scheduler to provide shared resources
+
+        Job which starts now is timed by the scheduler clock
+        """
+        self.journal = getattr(scheduler, "journal", None)
+        self.metrics = getattr(scheduler, "metrics", None)
+        self.demotions = 0
+        if self.quantum is None:
+            self.quantum = getattr(scheduler, "quantum", None)
+        if self.retry_policy is None:
+            self.retry_policy = getattr(scheduler, "retry_policy", None)
+        clock = getattr(scheduler, "clock", None)
+        if clock is not None and clock is not self.clock:
+            self.clock = clock
+            self.time_start = self.start_at or clock.now()
+
+    @property
+    def wait_priority(self) -> int:
+        """Priority in the wait queue, lowered by each demotion
+
+        Demotions are not saved, job is rescheduled with its priority
+        """
+        return self.priority - self.demotions
+
+    @property
+    def job_type(self) -> JobType | None:
+        klass = type(self)
+        try:
+            return _job_types[klass]
+        except KeyError:
+            job_type = _job_types[klass] = getattr(self._state, "TYPE", None)
+            return job_type
+
+    @property
+    def _state(self) -> JobMomento:
+        """Job state, captured when it is read after a change"""
+        if self._state_dirty:
+            self._captured_state = self._capture_state()
+            self._state_dirty = False
+        return self._captured_state
+
+    def __getstate__(self):
+        """Generators can not be pickled, so the job is sent without one
+
+        The journal and metrics stay with the scheduler process
+        """
+        state = dict(getattr(self, "__dict__", {}))
+        for klass in type(self).__mro__:
+            for name in getattr(klass, "__slots__", ()):
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
+        state["coro"] = None
+        state["journal"] = None
+        state["metrics"] = None
+        return state
+
+    def __setstate__(self, state: dict[str, Any]):
+        for name, value in state.items():
+            setattr(self, name, value)
 
     @staticmethod
-    def now():
-        return pytz.timezone("Europe/Moscow").localize(datetime.now())
+    def now() -> datetime:
+        return DEFAULT_CLOCK.now()
 
     @staticmethod
     def check_start_ready(func):
         @wraps(func)
         def inner(self, *args, **kwargs):
-            if self.now() < self.time_start or not all(
-                job.is_finished for job in self.dependencies
-            ):
-                raise JobNotReady()
-            func(self, *args, **kwargs)
+            if not self.is_ready:
+                if self.clock.now() < self.time_start or not all(
+                    job.is_finished for job in self.dependencies
+                ):
+                    raise JobNotReady()
+                self.is_ready = True
+            return func(self, *args, **kwargs)
 
         return inner
 
@@ -86,13 +250,8 @@ class Job:
     def check_timeout(func):
         @wraps(func)
         def inner(self, *args, **kwargs):
-            if self.max_working_time > 0 and (
-                self.time_start + timedelta(seconds=self.time_since_start)
-                > self.time_timeout
-            ):
-                logger.info("Execution time exceeded")
-                self.retry()
-            func(self, *args, **kwargs)
+            self._check_time_left()
+            return func(self, *args, **kwargs)
 
         return inner
 
@@ -100,38 +259,71 @@ class Job:
     def timeit(func):
         @wraps(func)
         def inner(self, *args, **kwargs):
-            start = time.time()
-            result = func(self, *args, **kwargs)
-            timed = time.time() - start
-            logger.debug(
-                "Function %s.%s completed in %.3f seconds",
-                self.__class__.__name__,
-                func.__name__,
-                timed,
-            )
-            self.time_since_start += timed
-            return result
+            generation = self.generation
+            start = self.clock.monotonic()
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                timed = self.clock.monotonic() - start
+                logger.debug(
+                    "Function %s.%s completed in %.3f seconds",
+                    self.__class__.__name__,
+                    func.__name__,
+                    timed,
+                )
+                if generation == self.generation:
+                    self.time_since_start += timed
+                    self._record_step(timed)
 
         return inner
 
     def run(self):
+        """Runs one step
+
+        Outcome of a step cancelled by `cancel_step()` is ignored
+        """
+        generation = self.generation
+        self.parked_on = None
         try:
             if not self.is_finished:
-                self._iter_job()
-        except JobSoftReset:
-            self.soft_reset()
-        except StopIteration:
-            self.is_finished = True
+                result = self._iter_job()
+                if generation != self.generation:
+                    return
+                self._check_time_left()
+                if isinstance(result, Park):
+                    self.parked_on = result
+        except (JobSoftReset, StopIteration) as outcome:
+            if generation == self.generation:
+                self._end_try(outcome)
         except Exception as error:
             logger.exception(error)
+            if self.error is None and not isinstance(error, JobNotReady):
+                self.error = error
         finally:
             self._save_state()
 
+    def _end_try(self, outcome: JobSoftReset | StopIteration):
+        """Restarts job after a failed try, finishes it after the last"""
+        if isinstance(outcome, JobSoftReset):
+            self.soft_reset()
+            self._back_off()
+        else:
+            self.is_finished = True
+
     @timeit
     @check_start_ready
     @check_timeout
     def _iter_job(self):
-        self.coro.send(None)
+        return self._generator().send(None)
+
+    def _generator(self):
+        """Generator of the current try
+
+        Created by the first step, so that waiting jobs do not hold one
+        """
+        if self.coro is None:
+            self.coro = self.target()
+        return self.coro
 
     def target(self):
         raise NotImplementedError(
@@ -143,36 +335,128 @@ class Job:
         self._save_state()
         self.is_finished = True
 
+    def cancel_step(self):
+        """Abandons running step after job ran out of time
+
+        Step can not be interrupted, it keeps running in its thread,
+        so resources of the try are kept until `release()` is called
+        once the step returns
+        Job restarts if it has tries left, otherwise it is finished
+        """
+        logger.info("Execution time exceeded, step is cancelled")
+        self.stats.cancelled += 1
+        if self.metrics is not None:
+            self.metrics.timeout(self)
+        try:
+            self.retry()
+        except JobSoftReset:
+            self.soft_reset(release=False)
+            self._back_off()
+        except StopIteration:
+            self.generation += 1
+            self.is_finished = True
+
+    def _check_time_left(self):
+        if 0 < self.max_working_time < self.time_since_start:
+            logger.info("Execution time exceeded")
+            if self.metrics is not None:
+                self.metrics.timeout(self)
+            self.retry()
+
+    def _record_step(self, timed: float):
+        self.last_step = timed
+        stats = self.stats
+        stats.steps += 1
+        if timed > stats.longest:
+            stats.longest = timed
+        self.overran = self.quantum is not None and timed > self.quantum
+        if self.overran:
+            stats.overruns += 1
+            stats.overrun_time += timed - self.quantum
+
     def _save_state(self):
+        """Marks job state as changed
+
+        State is captured on demand, when scheduler persists the job
+        """
+        self._state_dirty = True
+
+    def _capture_state(self) -> JobMomento:
         """Prepare state type and freeze job state"""
         defaults = dict(
             start_at=self.start_at,
             max_working_time=self.max_working_time,
             tries=self.tries,
             dependencies=self.dependencies or None,
+            uid=self.uid,
+            priority=self.priority,
         )
-        self._state = self.create_momento(defaults)
-        logger.info(f"self._state: {self._state}")
-
-    def soft_reset(self):
-        self.coro = self.target()
-        self.time_start = self.start_at or self.now()
+        state = self.create_momento(defaults)
+        logger.debug("%s: state captured %s", self.__class__.__name__, state)
+        return state
+
+    def release(self):
+        """Frees resources held by the try, such as open files"""
+        pass
+
+    def soft_reset(self, release: bool = True):
+        """Prepares the next try
+
+        `release` frees resources of the previous try, unless its
+        step is still running
+        """
+        if release:
+            self.release()
+        self.generation += 1
+        self.coro = None
+        self.time_start = self.start_at or self.clock.now()
         self.time_since_start = 0
-        self.time_timeout = self.time_start + timedelta(
-            seconds=self.max_working_time
-        )
         self._save_state()
         self.is_finished = False
+        self.is_ready = False
+        self.parked_on = None
+        self.error = None
+
+    def time_to_start(self) -> float:
+        """Returns seconds left until job may start, 0 once it started"""
+        if self.is_ready:
+            return 0.0
+        return max((self.time_start - self.clock.now()).total_seconds(), 0)
+
+    def _back_off(self):
+        """Delays the start of the next try
+
+        Scheduler keeps the job on its timer heap until then
+        """
+        delay, self.retry_after = self.retry_after, 0.0
+        if self.retry_policy is not None:
+            attempt = self.tries - self.tries_left
+            delay = max(delay, self.retry_policy.delay(attempt))
+        if delay > 0:
+            logger.info(
+                "%s: retry in %.3f seconds", self.__class__.__name__, delay
+            )
+            self.time_start = self.clock.now() + timedelta(seconds=delay)
+
+    def retry(self, delay: float = 0.0):
+        """Restarts job if it has tries left
 
-    def retry(self):
+        Next try starts in `delay` seconds at the earliest
+        """
         if self.tries_left > 0:
             self.tries_left -= 1
+            self.retry_after = delay
             logger.info(
                 "%s: restart. Tries left: %d",
                 self.__class__.__name__,
                 self.tries_left,
             )
+            if self.journal is not None:
+                self.journal.retry(self)
+            if self.metrics is not None:
+                self.metrics.retry(self)
             raise JobSoftReset()
+        self.error = JobFailed(f"{self.__class__.__name__}: no tries left")
         raise StopIteration()
 
 
@@ -184,6 +468,8 @@ class EmptyJobMomento(JobMomento):
 class EmptyJob(Job):
     """Empty Job which does nothing"""
 
+    __slots__ = ()
+
     def create_momento(self, defaults: dict[str, Any]):
         return EmptyJobMomento(**defaults)
 
@@ -199,6 +485,8 @@ class InfiniteJobMomento(JobMomento):
 class InfiniteJob(Job):
     """Empty Job which iterates infinitely"""
 
+    __slots__ = ()
+
     def create_momento(self, defaults: dict[str, Any]):
         return InfiniteJobMomento(**defaults)
 
@@ -0,0 +1,112 @@
+import logging
+import random
+import time
+from threading import Lock
+from typing import Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+BASE_DELAY = 0.5
+FACTOR = 2.0
+MAX_DELAY = 30.0
+THRESHOLD = 5
+COOLDOWN = 30.0
+
+
+class CircuitOpen(RuntimeError):
+    """Calls to the target are rejected until its circuit is closed"""
+
+    def __init__(self, key: Hashable, retry_after: float):
+        super().__init__(f"Circuit of {key} is open for {retry_after:.3f}s")
+        self.key = key
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        base: float = BASE_DELAY,
+        factor: float = FACTOR,
+        max_delay: float = MAX_DELAY,
+        jitter: float = 1.0,
+    ):
+        """Exponential backoff between tries of a job
+
+        The n-th retry waits `base * factor ** (n - 1)` seconds,
+        at most `max_delay`
+        `jitter` is the randomized share of the delay, so that jobs
+        failed together do not retry together, 0 disables it
+        """
+        self.base = base
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt: int) -> float:
+        """Returns seconds to wait before the `attempt`-th retry"""
+        delay = min(self.base * self.factor ** (attempt - 1), self.max_delay)
+        return delay * (1 - self.jitter * random.random())
+
+
+class CircuitBreaker:
+    """Stops calls to targets which keep failing
+
+    Circuit of a target, such as a host, opens after `threshold`
+    failures in a row and rejects calls for `cooldown` seconds
+    Then a single trial call is let through: its success closes
+    the circuit, its failure opens it again
+    Calls made while the trial is in flight are rejected for another
+    `cooldown` seconds, or until the trial outcome is known
+    """
+
+    def __init__(
+        self,
+        threshold: int = THRESHOLD,
+        cooldown: float = COOLDOWN,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures: dict[Hashable, int] = {}
+        self.opened_at: dict[Hashable, float] = {}
+        self.trials: set[Hashable] = set()
+        self.lock = Lock()
+
+    def check(self, key: Hashable):
+        """Raises CircuitOpen unless a call to the target may be made"""
+        with self.lock:
+            opened_at = self.opened_at.get(key)
+            if opened_at is None:
+                return
+            now = self.clock()
+            retry_after = opened_at + self.cooldown - now
+            if retry_after <= 0:
+                self.opened_at[key] = now
+                self.trials.add(key)
+                return
+        raise CircuitOpen(key, retry_after)
+
+    def success(self, key: Hashable):
+        with self.lock:
+            self.failures.pop(key, None)
+            self.opened_at.pop(key, None)
+            self.trials.discard(key)
+
+    def failure(self, key: Hashable):
+        with self.lock:
+            failures = self.failures[key] = self.failures.get(key, 0) + 1
+            if key in self.trials or failures >= self.threshold:
+                if key not in self.trials:
+                    logger.warning("circuit of %s is open", key)
+                self.opened_at[key] = self.clock()
+                self.trials.discard(key)
+
+    def retry_after(self, key: Hashable) -> float:
+        """Returns seconds left until the circuit lets a trial call"""
+        with self.lock:
+            opened_at = self.opened_at.get(key)
+            if opened_at is None:
+                return 0.0
+            return max(opened_at + self.cooldown - self.clock(), 0.0)
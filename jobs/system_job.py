@@ -1,5 +1,7 @@
+import itertools
 import logging
 import pathlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from typing import Any, ClassVar
 
@@ -16,45 +18,136 @@ class SystemAction:
 
 logger = logging.getLogger(__name__)
 
+BULK_WORKERS = 8
+BATCH_SIZE = 256
+
 
 @dataclass
 class SystemJobMomento(JobMomento):
     TYPE: ClassVar[JobType] = JobType.SYSTEM
     actions: list[list[Any]]
+    bulk: bool
+    workers: int
+    batch_size: int
 
 
 class SystemJob(Job):
-    def __init__(self, actions: list[list[Any]], *args, **kwargs):
+    __slots__ = ("actions", "bulk", "workers", "batch_size", "created_dirs")
+
+    def __init__(
+        self,
+        actions: list[list[Any]],
+        *args,
+        bulk: bool = False,
+        workers: int = BULK_WORKERS,
+        batch_size: int = BATCH_SIZE,
+        **kwargs,
+    ):
+        """System Job
+
+        `bulk` executes actions in batches instead of one per iteration:
+        consecutive actions of the same type are grouped by parent directory
+        and split by `batch_size`, batches run on `workers` threads
+        Moves are executed sequentially as they may depend on each other
+        Each iteration yields `(done, total)` actions after a batch
+        """
         self.actions = actions
+        self.bulk = bulk
+        self.workers = workers
+        self.batch_size = batch_size
+        self.created_dirs: set[pathlib.Path] | None = None
         super().__init__(*args, **kwargs)
 
     def create_momento(self, defaults: dict[str, Any]):
-        return SystemJobMomento(**defaults, actions=self.actions)
+        return SystemJobMomento(
+            **defaults,
+            actions=self.actions,
+            bulk=self.bulk,
+            workers=self.workers,
+            batch_size=self.batch_size,
+        )
 
     def target(self):
+        if self.bulk:
+            yield from self.iter_batches()
+            return
         try:
             for action, *paths in self.actions:
-                source, *target = paths
-                if action == SystemAction.CREATE_DIR:
-                    source = pathlib.Path(source)
-                    source.mkdir(parents=True, exist_ok=True)
-                elif action == SystemAction.CREATE:
-                    *path, file = source.split("/")
-                    path = pathlib.Path("/".join(path))
-                    path.mkdir(parents=True, exist_ok=True)
-                    path = path / file
-                    path.touch()
-                elif action == SystemAction.DELETE:
-                    source = pathlib.Path(source)
-                    source.unlink(missing_ok=True)
-                elif action == SystemAction.MOVE:
-                    if not target:
-                        raise RuntimeError("No target path provided")
-                    target, *_ = target
-                    source = pathlib.Path(source)
-                    source.rename(target)
-                else:
-                    pass
+                self.apply(action, *paths)
                 yield
         except RuntimeError as error:
             logger.error(error)
+
+    def iter_batches(self):
+        total = len(self.actions)
+        done = 0
+        executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="system"
+        )
+        try:
+            for action, group in itertools.groupby(
+                self.actions, key=lambda item: item[0]
+            ):
+                futures = {
+                    executor.submit(self.apply_batch, batch): len(batch)
+                    for batch in self.make_batches(action, list(group))
+                }
+                for future in as_completed(futures):
+                    future.result()
+                    done += futures[future]
+                    logger.info("System actions done: %d/%d", done, total)
+                    yield done, total
+        except RuntimeError as error:
+            logger.error(error)
+        finally:
+            executor.shutdown()
+
+    def make_batches(self, action: int, group: list[list[Any]]):
+        """Splits actions of the same type into independent batches"""
+        if action == SystemAction.MOVE:
+            yield group
+            return
+        directories: dict[pathlib.Path, list[list[Any]]] = {}
+        for item in group:
+            parent = pathlib.Path(item[1]).parent
+            directories.setdefault(parent, []).append(item)
+        for parent, items in directories.items():
+            if action == SystemAction.CREATE:
+                self.make_dir(parent)
+            for start in range(0, len(items), self.batch_size):
+                yield items[start : start + self.batch_size]
+
+    def apply_batch(self, batch: list[list[Any]]):
+        for action, *paths in batch:
+            self.apply(action, *paths)
+
+    def apply(self, action: int, source: str, *target: str):
+        """Executes one system action"""
+        if action == SystemAction.CREATE_DIR:
+            self.make_dir(pathlib.Path(source))
+        elif action == SystemAction.CREATE:
+            path = pathlib.Path(source)
+            self.make_dir(path.parent)
+            path.touch()
+        elif action == SystemAction.DELETE:
+            source = pathlib.Path(source)
+            source.unlink(missing_ok=True)
+        elif action == SystemAction.MOVE:
+            if not target:
+                raise RuntimeError("No target path provided")
+            target, *_ = target
+            source = pathlib.Path(source)
+            source.rename(target)
+            # Moved directories invalidate cached paths
+            self.created_dirs = None
+        else:
+            pass
+
+    def make_dir(self, path: pathlib.Path):
+        """Creates directory with its parents unless it was created before"""
+        if self.created_dirs is None:
+            self.created_dirs = set()
+        elif path in self.created_dirs:
+            return
+        path.mkdir(parents=True, exist_ok=True)
+        self.created_dirs.update([path, *path.parents])
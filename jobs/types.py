@@ -1,4 +1,12 @@
-from . import EmptyJob, FileJob, InfiniteJob, SystemJob, WebJob
+from . import (
+    AsyncFileJob,
+    AsyncWebJob,
+    EmptyJob,
+    FileJob,
+    InfiniteJob,
+    SystemJob,
+    WebJob,
+)
 from .constants import JobType
 
 JOB_TYPES = {
@@ -8,3 +16,9 @@ JOB_TYPES = {
     JobType.SYSTEM: SystemJob,
     JobType.WEB: WebJob,
 }
+
+ASYNC_JOB_TYPES = {
+    **JOB_TYPES,
+    JobType.FILE: AsyncFileJob,
+    JobType.WEB: AsyncWebJob,
+}
@@ -1,47 +1,351 @@
+import asyncio
+import itertools
 import logging
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import contextmanager
 from dataclasses import dataclass
 from queue import Queue
+from threading import BoundedSemaphore, Lock
 from typing import Any, ClassVar
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from .async_job import AsyncJob
+from .cache import CacheEntry, ResultCache
+from .channel import writable
 from .constants import JobType
 from .job import Job, JobMomento
+from .retry import CircuitBreaker, CircuitOpen
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 64 * 1024
+STREAM_END = object()
+
+
+class HttpSession:
+    """Connection pooled HTTP session shared by web jobs
+
+    Keeps connections alive between requests
+    Limits number of concurrent requests per host
+    Requests are sent from a thread pool, so one job may have
+    several requests in flight
+    `breaker` rejects requests to hosts which keep failing,
+    connection errors and 429 or 5xx responses are failures
+    """
+
+    def __init__(
+        self,
+        *,
+        per_host: int = 4,
+        max_connections: int = 10,
+        workers: int = 10,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.per_host = per_host
+        self.breaker = breaker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max_connections, pool_maxsize=max_connections
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="http"
+        )
+        self.limits: dict[str, BoundedSemaphore] = {}
+        self.lock = Lock()
+
+    @contextmanager
+    def limit(self, url: str):
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.limits:
+                self.limits[host] = BoundedSemaphore(self.per_host)
+            semaphore = self.limits[host]
+        with semaphore:
+            yield
+
+    def send(self, url: str, **kwargs) -> requests.Response:
+        """Sends GET request, circuit breaker records its outcome
+
+        Raises CircuitOpen if the host circuit rejects the request
+        """
+        if self.breaker is None:
+            with self.limit(url):
+                return self.session.get(url, **kwargs)
+        host = urlsplit(url).netloc
+        self.breaker.check(host)
+        try:
+            with self.limit(url):
+                response = self.session.get(url, **kwargs)
+        except requests.exceptions.RequestException:
+            self.breaker.failure(host)
+            raise
+        if response.status_code == 429 or response.status_code >= 500:
+            self.breaker.failure(host)
+        else:
+            self.breaker.success(host)
+        return response
+
+    def get(
+        self, url: str, headers: dict[str, str] | None = None
+    ) -> requests.Response:
+        return self.send(url, headers=headers)
+
+    def stream(self, url: str) -> requests.Response:
+        """Sends GET request without reading response body"""
+        return self.send(url, stream=True)
+
+    def submit(self, url: str, cache: ResultCache | None = None) -> Future:
+        """Sends GET request from the thread pool
+
+        With `cache` a fresh cached response is returned right away,
+        a request for the url already in flight is shared
+        """
+        if cache is None:
+            self.check(url)
+            return self.executor.submit(self.get, url)
+        key = (JobType.WEB, url)
+        entry = cache.lookup(key)
+        if cache.hit(entry):
+            future = Future()
+            future.set_result(entry.value)
+            return future
+        self.check(url)
+        return cache.coalesce(
+            key,
+            lambda: self.executor.submit(self.revalidate, url, cache, entry),
+        )
+
+    def check(self, url: str):
+        """Raises CircuitOpen if requests to the host are rejected
+
+        Fails before a request is sent from the thread pool
+        """
+        if self.breaker is None:
+            return
+        host = urlsplit(url).netloc
+        retry_after = self.breaker.retry_after(host)
+        if retry_after > 0:
+            raise CircuitOpen(host, retry_after)
+
+    def revalidate(
+        self, url: str, cache: ResultCache, entry: CacheEntry | None
+    ) -> requests.Response:
+        """Sends conditional request if stale response has validators
+
+        Not modified response refreshes the cached one,
+        successful response replaces it
+        """
+        key = (JobType.WEB, url)
+        headers = {}
+        if entry is not None:
+            if "etag" in entry.validators:
+                headers["If-None-Match"] = entry.validators["etag"]
+            if "last_modified" in entry.validators:
+                headers["If-Modified-Since"] = entry.validators[
+                    "last_modified"
+                ]
+        response = self.get(url, headers or None)
+        if entry is not None and response.status_code == 304:
+            logger.info("Not modified: %s", url)
+            cache.touch(key)
+            return entry.value
+        if response.status_code == 200:
+            validators = {}
+            if "ETag" in response.headers:
+                validators["etag"] = response.headers["ETag"]
+            if "Last-Modified" in response.headers:
+                validators["last_modified"] = response.headers["Last-Modified"]
+            cache.put(key, response, len(response.content), validators)
+        return response
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
 
 @dataclass
 class WebJobMomento(JobMomento):
     TYPE: ClassVar[JobType] = JobType.WEB
     urls: list[str]
     queue: Queue
+    concurrency: int
+    stream: bool
+    chunk_size: int
+    path: str | None
 
 
 class WebJob(Job):
     def __init__(
-        self, urls: list[str] = None, queue: Queue = None, *args, **kwargs
+        self,
+        urls: list[str] = None,
+        queue: Queue = None,
+        *args,
+        concurrency: int = 1,
+        stream: bool = False,
+        chunk_size: int = CHUNK_SIZE,
+        path: str | None = None,
+        session: HttpSession | None = None,
+        cache: ResultCache | None = None,
+        **kwargs,
     ):
+        """Web Job
+
+        `concurrency` is the number of requests kept in flight
+        `stream` reads response bodies by `chunk_size` bytes,
+        chunks are written to `path` if it is set or put to the queue
+        `session` is provided by scheduler unless it is set explicitly
+        `cache` shares responses of recently fetched urls between jobs,
+        scheduler cache is used unless it is set explicitly,
+        streamed responses are not cached
+        """
         self.urls = urls or []
         self.queue = queue
+        self.concurrency = concurrency
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.path = path
+        self.session = session
+        self.cache = cache
         super().__init__(*args, **kwargs)
 
     def create_momento(self, defaults: dict[str, Any]):
-        return WebJobMomento(**defaults, urls=self.urls, queue=self.queue)
+        return WebJobMomento(
+            **defaults,
+            urls=self.urls,
+            queue=self.queue,
+            concurrency=self.concurrency,
+            stream=self.stream,
+            chunk_size=self.chunk_size,
+            path=self.path,
+        )
+
+    def attach(self, scheduler):
+        super().attach(scheduler)
+        if self.session is None:
+            self.session = scheduler.http_session
+        if self.cache is None:
+            self.cache = getattr(scheduler, "cache", None)
 
     def target(self):
+        try:
+            if self.stream:
+                yield from self.iter_chunks()
+                return
+            urls = iter(self.urls)
+            pending = set()
+            while True:
+                pending.update(self.submit(urls, len(pending)))
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield self.handle(future.result())
+        except CircuitOpen as error:
+            logger.error(error)
+            self.retry(error.retry_after)
+        except requests.exceptions.RequestException as error:
+            logger.error(error)
+            self.retry()
+
+    def iter_chunks(self):
+        """Streams response bodies one chunk per iteration
+
+        Waits while the queue is full, so at most `chunk_size` bytes
+        are held by the job besides the queue
+        Yields the chunk when it is handed over, while waiting
+        yields None or a channel park
+        """
+        file = None if self.path is None else open(self.path, "wb")
         try:
             for url in self.urls:
-                response = requests.get(url)
-                response.raise_for_status()
-                logger.info(
-                    f"Status: %s. Content: %s",
-                    response.status_code,
-                    response.content[:100],
+                with self.get_session().stream(url) as response:
+                    response.raise_for_status()
+                    logger.info(
+                        "Status: %s. Streaming %s",
+                        response.status_code,
+                        url,
+                    )
+                    for chunk in response.iter_content(self.chunk_size):
+                        if file is not None:
+                            file.write(chunk)
+                        elif self.queue is not None:
+                            while self.queue.full():
+                                yield writable(self.queue)
+                            self.queue.put(chunk)
+                        yield chunk
+        finally:
+            if file is not None:
+                file.close()
+
+    def get_session(self) -> HttpSession:
+        if self.session is None:
+            self.session = HttpSession()
+        return self.session
+
+    def submit(self, urls, in_flight: int) -> list[Future]:
+        """Sends requests for the next urls up to job concurrency"""
+        session = self.get_session()
+        return [
+            session.submit(url, self.cache)
+            for url in itertools.islice(urls, self.concurrency - in_flight)
+        ]
+
+    def handle(self, response: requests.Response) -> requests.Response:
+        """Checks response and puts its content to the queue"""
+        response.raise_for_status()
+        logger.info(
+            f"Status: %s. Content: %s",
+            response.status_code,
+            response.content[:100],
+        )
+        if self.queue is not None:
+            self.queue.put(response.content)
+        return response
+
+
+class AsyncWebJob(AsyncJob, WebJob):
+    """Web Job for the asyncio scheduler
+
+    Requests are awaited while they are sent from the session thread pool,
+    so requests of different jobs overlap
+    """
+
+    async def target(self):
+        try:
+            if self.stream:
+                chunks = self.iter_chunks()
+                while True:
+                    chunk = await asyncio.to_thread(next, chunks, STREAM_END)
+                    if chunk is STREAM_END:
+                        return
+                    yield chunk
+            urls = iter(self.urls)
+            pending = set()
+            while True:
+                pending.update(
+                    asyncio.wrap_future(future)
+                    for future in self.submit(urls, len(pending))
                 )
-                if self.queue is not None:
-                    self.queue.put(response.content)
-                yield response
-        except requests.exceptions.HTTPError as error:
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in done:
+                    yield self.handle(future.result())
+        except CircuitOpen as error:
+            logger.error(error)
+            self.retry(error.retry_after)
+        except requests.exceptions.RequestException as error:
             logger.error(error)
             self.retry()
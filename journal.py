@@ -0,0 +1,152 @@
+import logging
+import os
+from threading import Lock
+from typing import Any, Iterator
+
+from jobs import Codec, Job, JobType, JsonCodec, restore_jobs
+
+logger = logging.getLogger(__name__)
+
+
+COMPACT_EVERY = 1000
+
+
+class Journal:
+    """Append-only log of scheduler events
+
+    Every schedule, start, retry and finish event is one `codec` record,
+    so appending does not depend on the number of jobs
+    Live jobs are tracked in memory and are written to the snapshot,
+    truncating the journal, once the events since the last compaction
+    reach both `compact_every` and the number of live jobs, so that
+    rewriting many live jobs is amortized over as many events
+    """
+
+    def __init__(
+        self,
+        path: str = "scheduler.journal",
+        *,
+        compact_every: int = COMPACT_EVERY,
+        fsync: bool = False,
+        codec: Codec | None = None,
+    ):
+        self.path = path
+        self.codec = codec or JsonCodec()
+        self.snapshot_path = f"{path}.snapshot"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.jobs: dict[str, dict[str, Any]] = {}
+        self.events = 0
+        self.lock = Lock()
+        self.file = open(self.path, "ab")
+
+    def schedule(self, job: Job):
+        self.__append(
+            {"event": "schedule", "uid": job.uid, "job": job.serialize()}
+        )
+
+    def start(self, job: Job):
+        self.__append({"event": "start", "uid": job.uid})
+
+    def retry(self, job: Job):
+        self.__append(
+            {"event": "retry", "uid": job.uid, "tries_left": job.tries_left}
+        )
+
+    def finish(self, job: Job):
+        self.__append({"event": "finish", "uid": job.uid})
+
+    def compact(self):
+        with self.lock:
+            self.__compact()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def replay(self) -> dict[str, dict[str, Any]]:
+        """Reads the snapshot and applies journal events on top of it
+
+        Returns live job records by job id in schedule order
+        """
+        jobs = {}
+        refs = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as file:
+                for record in self.codec.read_records(file, refs):
+                    jobs[record["uid"]] = record
+        with self.lock:
+            self.file.flush()
+            with open(self.path, "rb") as file:
+                for record in self.codec.read_records(file, refs):
+                    self.apply(jobs, record)
+            self.jobs = jobs
+        return jobs
+
+    def restore(
+        self, job_types: dict[JobType, type[Job]]
+    ) -> Iterator[Job]:
+        """Recreates live jobs one at a time, started jobs first
+
+        Keeps job ids and links dependencies which are still live
+        """
+        records = sorted(
+            self.replay().values(), key=lambda record: not record["started"]
+        )
+        states = []
+        for record in records:
+            state = record["job"]
+            if "tries_left" in record:
+                tries = record["tries_left"]
+                state = {
+                    **state,
+                    "task_body": {**state["task_body"], "tries": tries},
+                }
+            states.append(state)
+        return restore_jobs(states, job_types)
+
+    @staticmethod
+    def apply(jobs: dict[str, dict[str, Any]], record: dict[str, Any]):
+        """Applies event to live job records"""
+        uid = record["uid"]
+        event = record["event"]
+        if event == "schedule":
+            jobs[uid] = {"uid": uid, "job": record["job"], "started": False}
+        elif uid not in jobs:
+            return
+        elif event == "start":
+            jobs[uid]["started"] = True
+        elif event == "retry":
+            jobs[uid]["tries_left"] = record["tries_left"]
+        elif event == "finish":
+            del jobs[uid]
+
+    def __append(self, record: dict[str, Any]):
+        with self.lock:
+            self.codec.write_record(self.file, record)
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+            self.apply(self.jobs, record)
+            self.events += 1
+            if self.events >= max(self.compact_every, len(self.jobs)):
+                self.__compact()
+
+    def __compact(self):
+        """Writes live jobs to the snapshot and truncates the journal
+
+        Snapshot is replaced atomically, replaying events which survived
+        a crash in between gives the same state
+        """
+        temporary = f"{self.snapshot_path}.tmp"
+        with open(temporary, "wb") as file:
+            for record in self.jobs.values():
+                self.codec.write_record(file, record)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        os.replace(temporary, self.snapshot_path)
+        self.file.seek(0)
+        self.file.truncate()
+        self.events = 0
+        logger.info("journal: compacted %d jobs", len(self.jobs))
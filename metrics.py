@@ -0,0 +1,300 @@
+import bisect
+import logging
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Callable, Iterator
+
+from jobs import Job
+
+logger = logging.getLogger(__name__)
+
+
+STEP_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Sample = tuple[str, dict[str, str], float]
+
+
+def job_type_label(job: Job) -> str:
+    job_type = job.job_type
+    return "unknown" if job_type is None else job_type.value
+
+
+def format_value(value: float) -> str:
+    """Formats sample value without losing precision
+
+    Integral values, such as counts, are written without a fraction
+    """
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name, value.replace("\\", "\\\\").replace('"', '\\"')
+        )
+        for name, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+class Metric:
+    """Named metric with a fixed set of label names"""
+
+    TYPE = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.lock = Lock()
+
+    def samples(self) -> Iterator[Sample]:
+        raise NotImplementedError(
+            f"Method {self.__class__}.samples() should be implemented"
+        )
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.TYPE}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(
+                f"{name}{format_labels(labels)} {format_value(value)}"
+            )
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        super().__init__(name, documentation, labels)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self.values.get(labels, 0.0)
+
+    def samples(self) -> Iterator[Sample]:
+        with self.lock:
+            values = list(self.values.items())
+        for labels, value in values:
+            yield self.name, dict(zip(self.labels, labels)), value
+
+
+class Gauge(Metric):
+    """Metric read by `collect` callback when metrics are exported
+
+    Callback returns values by label values
+    """
+
+    TYPE = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels=(),
+        collect: Callable[[], dict[tuple[str, ...], float]] = dict,
+    ):
+        super().__init__(name, documentation, labels)
+        self.collect = collect
+
+    def samples(self) -> Iterator[Sample]:
+        for labels, value in self.collect().items():
+            yield self.name, dict(zip(self.labels, labels)), value
+
+
+class Histogram(Metric):
+    """Counts of observed values by bucket
+
+    Observations are not locked, they are expected from a single thread
+    such as the event loop
+    """
+
+    TYPE = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels=(),
+        buckets: tuple[float, ...] = STEP_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        """Counts value in its bucket
+
+        Series keeps a count per bucket, the +Inf bucket, sum and count
+        """
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 3)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self) -> Iterator[Sample]:
+        series = [(labels, list(row)) for labels, row in self.series.items()]
+        bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+        for labels, row in series:
+            labels = dict(zip(self.labels, labels))
+            total = 0
+            for bound, count in zip(bounds, row):
+                total += count
+                yield f"{self.name}_bucket", {**labels, "le": bound}, total
+            yield f"{self.name}_sum", labels, row[-2]
+            yield f"{self.name}_count", labels, row[-1]
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves metrics of `server.metrics` on any path"""
+
+    def do_GET(self):
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Metrics:
+    """Metrics registry of a scheduler
+
+    Job steps, retries and timeouts are counted as they happen,
+    queue depths are read only when metrics are exported
+    Exported in Prometheus text format by `render()`, `write()`
+    or `serve()`
+    """
+
+    def __init__(self, step_buckets: tuple[float, ...] = STEP_BUCKETS):
+        self.steps = Histogram(
+            "scheduler_step_seconds",
+            "Job step duration",
+            ("job_type",),
+            step_buckets,
+        )
+        self.retries = Counter(
+            "scheduler_retries_total", "Job restarts", ("job_type",)
+        )
+        self.timeouts = Counter(
+            "scheduler_timeouts_total",
+            "Jobs which exceeded max working time",
+            ("job_type",),
+        )
+        self.overruns = Counter(
+            "scheduler_overruns_total",
+            "Job steps longer than quantum",
+            ("job_type",),
+        )
+        self.finished = Counter(
+            "scheduler_jobs_finished_total", "Finished jobs", ("job_type",)
+        )
+        self.loop_idle = Counter(
+            "scheduler_loop_idle_seconds_total",
+            "Time event loop waited for work",
+        )
+        self.loop_started = None
+        self.metrics: list[Metric] = [
+            self.steps,
+            self.retries,
+            self.timeouts,
+            self.overruns,
+            self.finished,
+            self.loop_idle,
+            Gauge(
+                "scheduler_loop_utilization",
+                "Share of time event loop was busy",
+                collect=self.__utilization,
+            ),
+        ]
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def step(self, job: Job):
+        self.steps.observe(job.last_step, job_type_label(job))
+
+    def retry(self, job: Job):
+        self.retries.inc(job_type_label(job))
+
+    def timeout(self, job: Job):
+        self.timeouts.inc(job_type_label(job))
+
+    def overrun(self, job: Job):
+        self.overruns.inc(job_type_label(job))
+
+    def finish(self, job: Job):
+        self.finished.inc(job_type_label(job))
+
+    def start_loop(self):
+        self.loop_started = time.monotonic()
+
+    def idle(self, seconds: float):
+        self.loop_idle.inc(amount=seconds)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+    def write(self, path: str):
+        """Writes metrics to a file, replacing it atomically
+
+        Suits the textfile collector of node exporter
+        """
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            file.write(self.render())
+        os.replace(temporary, path)
+
+    def serve(
+        self, port: int = 0, host: str = "127.0.0.1"
+    ) -> ThreadingHTTPServer:
+        """Serves metrics over HTTP in a daemon thread
+
+        Returns the server, its address tells the port
+        """
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        server.metrics = self
+        Thread(target=server.serve_forever, daemon=True).start()
+        logger.info("metrics: serving on %s:%d", *server.server_address)
+        return server
+
+    def __utilization(self) -> dict[tuple[str, ...], float]:
+        if self.loop_started is None:
+            return {}
+        uptime = time.monotonic() - self.loop_started
+        if uptime <= 0:
+            return {}
+        return {(): max(0.0, 1 - self.loop_idle.value() / uptime)}
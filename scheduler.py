@@ -1,14 +1,111 @@
-import json
+import heapq
+import itertools
 import logging
 import time
-from threading import Lock, Thread
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from enum import Enum
+from functools import partial
+from queue import SimpleQueue
+from threading import Condition, Lock, Thread, current_thread
+from typing import Iterable, Iterator
 
-from jobs import JOB_TYPES, Job
+from graph import JobGraph
+from jobs import (
+    DEFAULT_CLOCK,
+    JOB_TYPES,
+    Clock,
+    Codec,
+    HttpSession,
+    Job,
+    JobType,
+    JsonCodec,
+    ResultCache,
+    RetryPolicy,
+    StepStats,
+    restore_jobs,
+)
+from journal import Journal
+from metrics import Gauge, Metrics
+from wait_queue import WaitQueue
 
 logger = logging.Logger(__name__)
 
 
-ITER_SECS = 0.5
+QUANTUM = 0.1
+BATCH = 32
+SCHEDULE_CHUNK = 1024
+
+
+class Route(str, Enum):
+    """Where job iterations are executed"""
+
+    LOOP = "loop"
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+class Overrun(str, Enum):
+    """What happens to a job which step overran its quantum"""
+
+    OFFLOAD = "offload"
+    DEMOTE = "demote"
+
+
+DEFAULT_ROUTES = {
+    JobType.FILE: Route.THREAD,
+    JobType.SYSTEM: Route.THREAD,
+    JobType.WEB: Route.THREAD,
+}
+# Jobs are pickled to be sent to worker processes, file and web jobs
+# hold queues and connection pools, which can not be pickled
+PROCESS_JOB_TYPES = {JobType.EMPTY, JobType.INFINITE, JobType.SYSTEM}
+
+
+def read_lockfile(
+    lockfile: str,
+    job_types: dict[JobType, type[Job]],
+    codec: Codec | None = None,
+) -> Iterator[Job]:
+    """Restores jobs saved by `write_lockfile()`, active jobs first
+
+    Jobs are decoded one at a time while the result is iterated
+    """
+    codec = codec or JsonCodec()
+    with open(lockfile, "rb") as file:
+        yield from restore_jobs(codec.load(file), job_types)
+
+
+def write_lockfile(
+    lockfile: str,
+    active: list[Job],
+    waiting: list[Job],
+    codec: Codec | None = None,
+):
+    """Dumps active and waiting jobs states"""
+    codec = codec or JsonCodec()
+    with open(lockfile, "wb") as file:
+        codec.dump(file, active, waiting)
+
+
+def run_until_finished(job: Job) -> tuple[int, float, Exception | None]:
+    """Runs job iterations in a worker process
+
+    Generators can not be sent between processes,
+    so the whole job is executed at once
+    Returns tries left, execution time and error
+    Sleeps while job backs off before the next try
+    """
+    while not job.is_finished:
+        time.sleep(job.time_to_start())
+        job.run()
+    return job.tries_left, job.time_since_start, job.error
 
 
 class SingletonMeta(type):
@@ -22,25 +119,153 @@ class SingletonMeta(type):
 
 class Scheduler(metaclass=SingletonMeta):
     def __init__(
-        self, *, pool_size: int = 10, lockfile: str = "scheduler.lock"
+        self,
+        *,
+        pool_size: int = 10,
+        lockfile: str = "scheduler.lock",
+        routes: dict[JobType, Route] | None = None,
+        process_pool_size: int = 0,
+        http_session: HttpSession | None = None,
+        journal: Journal | None = None,
+        codec: Codec | None = None,
+        clock: Clock | None = None,
+        weights: dict[JobType, float] | None = None,
+        quantum: float | None = QUANTUM,
+        on_overrun: Overrun = Overrun.OFFLOAD,
+        metrics: Metrics | None = None,
+        batch: int = BATCH,
+        cache: ResultCache | None = None,
+        retry_policy: RetryPolicy | None = None,
     ):
-        self.tasks_active = []
+        """Scheduler
+
+        `pool_size` limits both active jobs and worker threads
+        `routes` tells where iterations of each job type are executed:
+        in the event loop thread, in a worker thread or in a worker process,
+        only jobs of `PROCESS_JOB_TYPES` can be sent to worker processes
+        `process_pool_size` enables worker processes for CPU-bound jobs
+        `http_session` is a connection pool shared by web jobs
+        `journal` records job events as they happen,
+        so that `restart()` recovers after a crash
+        `codec` is the lock file format, JSON by default
+        `clock` times delayed starts and timeouts of scheduled jobs
+        `weights` are shares of free slots given to waiting jobs
+        of each type, 1 by default
+        `quantum` is the default step time slice of jobs in seconds
+        `on_overrun` tells what to do with a job which step overran it:
+        next steps are offloaded to worker threads,
+        or job is moved back to the wait queue one priority lower
+        Steps in worker threads are cancelled once job runs out of
+        `max_working_time`
+        `metrics` collects step latencies, retries, timeouts
+        and queue depths, a new registry is used by default
+        `batch` is the number of steps run per event loop lock acquisition
+        `cache` shares results of web and file reads between jobs,
+        results are not cached by default
+        `retry_policy` is the default backoff between tries of jobs,
+        jobs which back off are parked on the timer heap
+        """
+        self.routes = DEFAULT_ROUTES if routes is None else routes
+        for job_type, route in self.routes.items():
+            if route != Route.PROCESS:
+                continue
+            if job_type not in PROCESS_JOB_TYPES:
+                raise ValueError(f"Jobs of type {job_type} can not be pickled")
+            if process_pool_size < 1:
+                raise ValueError(
+                    "Process route requires process_pool_size > 0"
+                )
+        self.tasks_active: deque[Job] = deque()
+        self.tasks_running: dict[Job, int] = {}
+        self.tasks_parked = set()
+        self.tasks_offloaded = set()
+        self.tasks_demoted = set()
+        self.tasks_cancelled: dict[Job, int] = {}
+        self.deadlines = []
+        self.step_deadlines: dict[Job, int] = {}
+        self.batch = batch
+        self.quantum = quantum
+        self.on_overrun = on_overrun
         self.pool_size = pool_size
-        self.tasks_wait = []
+        self.process_pool_size = process_pool_size
+        self.thread_pool = None
+        self.process_pool = None
+        self.wakeups = SimpleQueue()
+        self.futures: dict[Job, Future] = {}
+        self.completions = SimpleQueue()
+        self.finished = Condition()
+        self.http_session = http_session or HttpSession()
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.journal = journal
+        self.codec = codec or JsonCodec()
+        self.clock = clock or DEFAULT_CLOCK
+        self.clock.subscribe(self.__tick)
+        self.weights = weights
+        self.tasks_wait = WaitQueue(weights)
+        self.tasks_delayed = []
+        self.graph = JobGraph()
         self.lockfile = lockfile
         self.lock = Lock()
+        self.condition = Condition(self.lock)
         self.event_loop_started = False
+        self.event_loop_paused = False
+        self.event_loop_thread = None
+        self._timer_ids = itertools.count()
+        self.metrics = metrics or Metrics()
+        self.metrics.register(
+            Gauge(
+                "scheduler_jobs",
+                "Scheduled jobs by state",
+                ("state",),
+                self.__queue_depths,
+            )
+        )
 
-    def schedule(self, task: Job):
-        """Schedules task with its dependencies"""
-        self.__stop_event_loop()
-        if len(self.tasks_active) + len(task.dependencies) < self.pool_size:
-            self.tasks_active.extend(task.dependencies)
-            self.tasks_active.append(task)
-        else:
-            self.tasks_wait.extend(task.dependencies)
-            self.tasks_wait.append(task)
-        self.__start_event_loop()
+    def schedule(self, task: Job) -> Future:
+        """Schedules task with its dependencies
+
+        Skips dependencies which are already scheduled or finished
+        Jobs waiting for dependencies are kept in the dependency graph
+        Jobs which start in the future are parked on the timer heap
+        Wakes up event loop, so that new jobs start immediately
+        Returns future resolved with the task when it is done,
+        or with its error if it failed; `stop()` cancels it
+        Raises DependencyCycleError if dependencies form a cycle
+        Takes the loop lock once and does not resume a paused loop
+        """
+        return self.schedule_many([task])[0]
+
+    def schedule_many(self, tasks: Iterable[Job]) -> list[Future]:
+        """Schedules tasks with their dependencies
+
+        Tasks are taken from `tasks` by chunks of `SCHEDULE_CHUNK`
+        outside of the loop lock, so that a slow generator does not
+        stall running jobs, each chunk is added under a single loop lock
+        acquisition
+        Returns futures of the tasks in their order
+        Raises DependencyCycleError if dependencies form a cycle,
+        tasks before the failed one stay scheduled
+        Called from a job step, tasks are added under the loop lock
+        the event loop already holds
+        """
+        futures = []
+        if current_thread() is self.event_loop_thread:
+            for task in tasks:
+                self.__add(task)
+                futures.append(self.futures[task])
+            return futures
+        tasks = iter(tasks)
+        while chunk := list(itertools.islice(tasks, SCHEDULE_CHUNK)):
+            with self.condition:
+                try:
+                    for task in chunk:
+                        self.__add(task)
+                        futures.append(self.futures[task])
+                finally:
+                    self.__start_thread()
+                    self.condition.notify()
+        return futures
 
     def run(self):
         self.__start_event_loop()
@@ -48,25 +273,22 @@ class Scheduler(metaclass=SingletonMeta):
     def restart(self):
         """Restarts scheduler
 
-        Reads saved task states
+        Reads saved task states, replays the journal if there is one
         Stops event loop
-        Restores waiting, active tasks
+        Restores waiting, active tasks, decoding them one at a time
         Starts event loop
         """
-        with open(self.lockfile, "r") as file:
-            data = json.load(file)
-        active = data.get("active", [])
-        waiting = data.get("waiting", [])
+        if self.journal is not None:
+            jobs = self.journal.restore(JOB_TYPES)
+        else:
+            jobs = read_lockfile(self.lockfile, JOB_TYPES, self.codec)
         self.__stop_event_loop()
-        for state in [*waiting, *active[self.pool_size :]]:
-            job_type = state.get("type")
-            job_klass = JOB_TYPES.get(job_type, Job)
-            self.tasks_wait.append(job_klass(**state))
-        for state in active[: self.pool_size]:
-            job_type = state.get("type")
-            job_klass = JOB_TYPES.get(job_type, Job)
-            self.tasks_active.append(job_klass(**state))
-        self.__start_event_loop()
+        try:
+            with self.lock:
+                for task in jobs:
+                    self.__add(task)
+        finally:
+            self.__start_event_loop()
 
     def pause(self):
         self.__stop_event_loop()
@@ -76,73 +298,445 @@ class Scheduler(metaclass=SingletonMeta):
 
         Stops event loop and tasks
         Saves waiting, active tasks states
-        Dumps tasks states to filesystem
-        Clears task queues
+        Dumps tasks states to filesystem and compacts the journal
+        Clears task queues, cancels futures of unfinished tasks
+        Shuts down worker pools without waiting for running steps
         """
         self.__stop_event_loop()
-        for task in self.tasks_active:
-            task.stop()
-        waiting = [task.serialize() for task in self.tasks_wait]
-        active = [task.serialize() for task in self.tasks_active]
-        with open(self.lockfile, "w") as file:
-            json.dump({"active": active, "waiting": waiting}, file)
-        self.tasks_wait = []
-        self.tasks_active = []
-
-    def join(self):
-        while True:
+        with self.lock:
+            for task in self.tasks_active:
+                task.stop()
+            waiting = [
+                *self.tasks_wait,
+                *(job for _, _, job in sorted(self.tasks_delayed)),
+                *self.graph.blocked,
+            ]
+            write_lockfile(
+                self.lockfile, self.tasks_active, waiting, self.codec
+            )
+            if self.journal is not None:
+                self.journal.compact()
+            futures = self.futures
+            self.tasks_wait = WaitQueue(self.weights)
+            self.tasks_active = deque()
+            self.tasks_running = {}
+            self.tasks_parked = set()
+            self.tasks_offloaded = set()
+            self.tasks_demoted = set()
+            self.tasks_cancelled = {}
+            self.tasks_delayed = []
+            self.deadlines = []
+            self.step_deadlines = {}
+            self.graph = JobGraph()
+            self.futures = {}
+            pools = [self.thread_pool, self.process_pool]
+            self.thread_pool = None
+            self.process_pool = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        for future in futures.values():
+            future.cancel()
+        with self.finished:
+            self.finished.notify_all()
+
+    def overruns(self) -> dict[str, StepStats]:
+        """Step statistics of scheduled jobs which overran their quantum
+        or had a step cancelled
+        """
+        return {
+            job.uid: job.stats
+            for job in list(self.graph.jobs)
+            if job.stats.overruns or job.stats.cancelled
+        }
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Waits until all scheduled jobs are done
+
+        Returns False if `timeout` seconds passed first
+        """
+        with self.finished:
+            return self.finished.wait_for(
+                lambda: len(self.graph) == 0, timeout
+            )
+
+    def wait_any(
+        self,
+        futures: Iterable[Future] | None = None,
+        timeout: float | None = None,
+    ) -> set[Future]:
+        """Waits until any of `futures` or any scheduled job is done
+
+        Returns done futures, empty if `timeout` seconds passed first
+        """
+        if futures is None:
             with self.lock:
-                if len(self.tasks_active) + len(self.tasks_wait) == 0:
-                    break
-            time.sleep(ITER_SECS)
+                futures = list(self.futures.values())
+        return wait(futures, timeout, return_when=FIRST_COMPLETED).done
 
-    def __start_event_loop(self):
+    def __queue_depths(self) -> dict[tuple[str, ...], float]:
+        """Read without the loop lock, so values may be slightly off"""
+        return {
+            ("active",): len(self.tasks_active),
+            ("waiting",): len(self.tasks_wait),
+            ("delayed",): len(self.tasks_delayed),
+            ("blocked",): len(self.graph.in_degree),
+            ("running",): len(self.tasks_running),
+            ("parked",): len(self.tasks_parked),
+        }
+
+    def __start_thread(self):
+        """Starts event loop thread, called with the loop lock held"""
         if not self.event_loop_started:
             thread = Thread(target=self.__event_loop, daemon=True)
+            self.event_loop_thread = thread
             thread.start()
             self.event_loop_started = True
-        if self.lock.locked():
-            self.lock.release()
-            logger.info("event loop: started")
+
+    def __start_event_loop(self):
+        """Resumes paused event loop, from any thread"""
+        with self.condition:
+            self.__start_thread()
+            if self.event_loop_paused:
+                self.event_loop_paused = False
+                self.condition.notify()
+                logger.info("event loop: started")
 
     def __stop_event_loop(self):
-        if not self.lock.locked():
-            self.lock.acquire()
-            logger.info("event loop: stopped")
+        """Pauses event loop between batches
+
+        No job steps are started once it returns
+        """
+        with self.condition:
+            if not self.event_loop_paused:
+                self.event_loop_paused = True
+                logger.info("event loop: stopped")
+
+    def __wake(self, job: Job, generation: int | None = None):
+        """Returns job back to the event loop
+
+        Called when job iteration in a worker is done or parked job may
+        proceed, possibly from another thread
+        Iteration is identified by job generation, so that the end
+        of a cancelled one is ignored
+        """
+        self.wakeups.put((job, generation))
+        if current_thread() is not self.event_loop_thread:
+            with self.condition:
+                self.condition.notify()
+
+    def __tick(self):
+        """Wakes event loop up to check timers after clock jumped forward"""
+        if (
+            not self.event_loop_paused
+            and current_thread() is not self.event_loop_thread
+        ):
+            with self.condition:
+                self.condition.notify()
+
+    def __process_wakeups(self):
+        while not self.wakeups.empty():
+            job, generation = self.wakeups.get()
+            if (
+                generation is not None
+                and self.tasks_cancelled.get(job) == generation
+            ):
+                del self.tasks_cancelled[job]
+                self.tasks_running.pop(job, None)
+                job.release()
+                continue
+            if job in self.tasks_running:
+                submitted = self.tasks_running[job]
+                if generation is not None and generation != submitted:
+                    continue
+                del self.tasks_running[job]
+                self.__drop_deadline(job)
+                self.metrics.step(job)
+                if job.overran:
+                    self.__overran(job, Route.THREAD)
+                self.__park(job)
+            else:
+                self.tasks_parked.discard(job)
+
+    def __park(self, job: Job):
+        """Stops iterating job until the thing it waits for happens"""
+        if job.parked_on is not None and job.parked_on.subscribe(
+            partial(self.__wake, job)
+        ):
+            logger.info("event loop: job %s parked", job)
+            self.tasks_parked.add(job)
+
+    def __add(self, task: Job):
+        """Registers task with its dependencies and places ready jobs"""
+        for job in self.graph.add(task):
+            job.attach(self)
+            self.futures[job] = Future()
+            if self.journal is not None:
+                self.journal.schedule(job)
+            if self.graph.is_ready(job):
+                self.__place(job)
+
+    def __place(self, job: Job):
+        """Puts ready job to the timer heap, pool or wait list"""
+        if job.time_start > self.clock.now():
+            self.__add_timer(job)
+        elif len(self.tasks_active) < self.pool_size:
+            self.__activate(job)
+        else:
+            self.tasks_wait.push(job)
+
+    def __activate(self, job: Job):
+        """Moves job to the pool"""
+        self.tasks_active.append(job)
+        if self.journal is not None:
+            self.journal.start(job)
+
+    def __add_timer(self, job: Job):
+        """Parks job on the timer heap until its start time"""
+        heapq.heappush(
+            self.tasks_delayed, (job.time_start, next(self._timer_ids), job)
+        )
+
+    def __fire_timers(self) -> float | None:
+        """Moves due jobs from the timer heap to the pool
+
+        Returns seconds left until the next timer or None if there are none
+        """
+        if not self.tasks_delayed:
+            return None
+        now = self.clock.now()
+        while self.tasks_delayed and self.tasks_delayed[0][0] <= now:
+            _, _, job = heapq.heappop(self.tasks_delayed)
+            logger.info("event loop: job %s is due", job)
+            if len(self.tasks_active) < self.pool_size:
+                self.__activate(job)
+            else:
+                self.tasks_wait.push(job)
+        if not self.tasks_delayed:
+            return None
+        return (self.tasks_delayed[0][0] - now).total_seconds()
+
+    def __add_deadline(self, job: Job):
+        """Watches job iteration running in a worker thread
+
+        Job has one deadline at a time, the one of its running step
+        """
+        time_left = job.max_working_time - job.time_since_start
+        deadline_id = next(self._timer_ids)
+        heapq.heappush(
+            self.deadlines,
+            (self.clock.monotonic() + time_left, deadline_id, job),
+        )
+        self.step_deadlines[job] = deadline_id
+
+    def __drop_deadline(self, job: Job):
+        """Forgets deadline of a step which returned in time
+
+        Its heap entry is skipped when it comes up, the heap is rebuilt
+        once most of its entries are stale
+        """
+        if self.step_deadlines.pop(job, None) is None:
+            return
+        if len(self.deadlines) > 2 * len(self.step_deadlines):
+            live = set(self.step_deadlines.values())
+            self.deadlines = [
+                entry for entry in self.deadlines if entry[1] in live
+            ]
+            heapq.heapify(self.deadlines)
+
+    def __fire_deadlines(self) -> float | None:
+        """Cancels iterations of jobs which ran out of time
+
+        Job which restarts is kept running until the cancelled iteration
+        returns, so that two iterations of the job never overlap
+
+        Returns seconds left until the next deadline or None
+        """
+        now = self.clock.monotonic()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, deadline_id, job = heapq.heappop(self.deadlines)
+            if self.step_deadlines.get(job) != deadline_id:
+                continue
+            logger.info("event loop: job %s ran out of time", job)
+            del self.step_deadlines[job]
+            generation = self.tasks_running.pop(job)
+            job.cancel_step()
+            self.tasks_cancelled[job] = generation
+            if not job.is_finished:
+                self.tasks_running[job] = generation
+        if not self.deadlines:
+            return None
+        return self.deadlines[0][0] - now
+
+    def __overran(self, job: Job, route: Route):
+        """Keeps job which steps overrun its quantum from stalling others"""
+        logger.info("event loop: job %s overran its quantum", job)
+        self.metrics.overrun(job)
+        if self.on_overrun == Overrun.DEMOTE:
+            self.tasks_demoted.add(job)
+        elif route == Route.LOOP:
+            self.tasks_offloaded.add(job)
+
+    def __demote(self) -> bool:
+        """Swaps demoted job in front of the ring with the next waiting one
+
+        Returns False if there are no waiting jobs
+        """
+        if len(self.tasks_wait) == 0:
+            return False
+        job = self.tasks_active.popleft()
+        self.tasks_demoted.discard(job)
+        logger.info("event loop: job %s demoted", job)
+        job.demotions += 1
+        self.tasks_wait.push(job)
+        self.__activate(self.tasks_wait.pop())
+        return True
 
     def __event_loop(self):
         """Scheduler Event Loop
 
         Loops infinitely, assuming it is called as a daemon
-        Runs one iteration at a time
-        If job is done - remove job and add job from wait list
-        Extends cursor pointing to the next task
+        Moves due jobs from the timer heap to the pool
+        Sleeps until the next timer, `schedule()` or a worker
+        if there is nothing to run, and while it is paused
+        Runs or submits up to `batch` iterations per lock acquisition,
+        fewer if they take longer than the quantum
         """
-        logger.info(f"event loop: started for the first time")
-        current = 0
+        logger.info("event loop: started for the first time")
+        self.metrics.start_loop()
         while True:
+            self.__resolve_completions()
             with self.lock:
-                if len(self.tasks_active) == 0:
-                    self.lock.release()
-                    time.sleep(ITER_SECS)
-                    self.lock.acquire()
+                if self.event_loop_paused:
+                    self.condition.wait()
                     continue
-                job = self.tasks_active[current]
-                if not job.is_finished:
-                    logger.info(f"event loop: job %s iteration started", job)
-                    self.__process_job(job)
-                    logger.info(f"event loop: job %s iteration finished", job)
-                else:
-                    logger.info(f"event loop: job %s finished", job)
-                    self.tasks_active.pop(current)
+                self.__process_wakeups()
+                timeouts = [self.__fire_timers(), self.__fire_deadlines()]
+                timeouts = [left for left in timeouts if left is not None]
+                timeout = min(timeouts, default=None)
+                idle = len(self.tasks_running) + len(self.tasks_parked)
+                if len(self.tasks_active) == idle:
+                    waited = time.monotonic()
+                    self.condition.wait(timeout)
+                    self.metrics.idle(time.monotonic() - waited)
+                    continue
+                started = time.monotonic()
+                for _ in range(self.batch):
+                    if not self.tasks_active:
+                        break
+                    self.__step()
                     if (
-                        len(self.tasks_active) < self.pool_size
-                        and len(self.tasks_wait) > 0
+                        self.quantum is not None
+                        and time.monotonic() - started > self.quantum
                     ):
-                        self.tasks_active.append(self.tasks_wait.pop())
-                active = len(self.tasks_active)
-                current = (current + 1) % active if active > 0 else 0
+                        break
 
-    @staticmethod
-    def __process_job(job: Job):
-        job.run()
+    def __step(self):
+        """Visits the job in front of the active ring
+
+        Active jobs are visited round robin: the job is rotated
+        to the back of the ring, or removed from the front in O(1)
+        Skips jobs which iteration is still running in a worker
+        and jobs parked until a channel has space or items
+        Swaps demoted jobs with waiting ones
+        Moves jobs backing off before a retry to the timer heap
+        If job is done - remove job and add job from wait list
+        """
+        active = self.tasks_active
+        job = active[0]
+        if job in self.tasks_running or job in self.tasks_parked:
+            active.rotate(-1)
+            return
+        if not job.is_finished and job.time_to_start() > 0:
+            logger.info("event loop: job %s backs off", job)
+            active.popleft()
+            self.__add_timer(job)
+            self.__fill()
+            return
+        if not job.is_finished:
+            if job in self.tasks_demoted and self.__demote():
+                return
+            logger.info("event loop: job %s iteration started", job)
+            self.__process_job(job)
+            logger.info("event loop: job %s iteration finished", job)
+            active.rotate(-1)
+            return
+        logger.info("event loop: job %s finished", job)
+        active.popleft()
+        self.tasks_offloaded.discard(job)
+        self.tasks_demoted.discard(job)
+        if self.journal is not None:
+            self.journal.finish(job)
+        self.metrics.finish(job)
+        self.completions.put((job, self.futures.pop(job, None)))
+        for dependent in self.graph.finish(job):
+            self.__place(dependent)
+        self.__fill()
+
+    def __fill(self):
+        """Moves next waiting job to the pool if it has a free slot"""
+        if len(self.tasks_active) < self.pool_size and len(self.tasks_wait):
+            self.__activate(self.tasks_wait.pop())
+
+    def __resolve_completions(self):
+        """Resolves futures of done jobs and wakes up `join()` callers
+
+        Runs outside of the loop lock, so that future callbacks
+        may call scheduler methods
+        """
+        if self.completions.empty():
+            return
+        while not self.completions.empty():
+            job, future = self.completions.get()
+            if future is None or not future.set_running_or_notify_cancel():
+                continue
+            if job.error is not None:
+                future.set_exception(job.error)
+            else:
+                future.set_result(job)
+        with self.finished:
+            self.finished.notify_all()
+
+    def __process_job(self, job: Job):
+        """Runs job iteration according to its route"""
+        route = self.routes.get(job.job_type, Route.LOOP)
+        if route == Route.LOOP and job in self.tasks_offloaded:
+            route = Route.THREAD
+        if route == Route.LOOP:
+            job.run()
+            self.metrics.step(job)
+            if job.overran:
+                self.__overran(job, route)
+            self.__park(job)
+            return
+        self.tasks_running[job] = job.generation
+        if route == Route.THREAD:
+            if self.thread_pool is None:
+                self.thread_pool = ThreadPoolExecutor(
+                    max_workers=self.pool_size,
+                    thread_name_prefix="scheduler",
+                )
+            generation = job.generation
+            if job.max_working_time > 0:
+                self.__add_deadline(job)
+            future = self.thread_pool.submit(job.run)
+            future.add_done_callback(
+                lambda _: self.__wake(job, generation)
+            )
+        else:
+            if self.process_pool is None:
+                self.process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_pool_size
+                )
+            future = self.process_pool.submit(run_until_finished, job)
+            future.add_done_callback(partial(self.__finish_remote, job))
+
+    def __finish_remote(self, job: Job, future: Future):
+        """Copies results of a job executed in a worker process"""
+        try:
+            job.tries_left, job.time_since_start, job.error = future.result()
+        except Exception as error:
+            logger.exception(error)
+            job.error = error
+        job.is_finished = True
+        self.__wake(job)
@@ -0,0 +1,135 @@
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+
+from jobs import JOB_TYPES, Job, JobType
+from job_store import JobStore, Status
+from scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+
+LEASE = 5.0
+POLL = 0.05
+
+
+def run_worker(
+    path: str,
+    owner: str,
+    job_types: dict[JobType, type[Job]],
+    pool_size: int,
+    lease: float,
+    poll: float,
+):
+    """Worker process claiming jobs from the store
+
+    Runs claimed jobs in its own scheduler and renews their leases
+    """
+    store = JobStore(path)
+    scheduler = Scheduler(pool_size=pool_size, lockfile=os.devnull)
+    scheduler.run()
+    running = {}
+    renew_at = 0.0
+    logger.info("worker %s: started", owner)
+    while True:
+        now = time.monotonic()
+        if now >= renew_at:
+            store.renew(owner, lease)
+            renew_at = now + lease / 3
+        free = pool_size - len(running)
+        if free > 0:
+            for job in store.claim(owner, free, lease, job_types):
+                running[scheduler.schedule(job)] = job.uid
+        if not running:
+            time.sleep(poll)
+            continue
+        for future in scheduler.wait_any(list(running), timeout=poll):
+            uid = running.pop(future)
+            store.finish(uid, owner, future.exception())
+
+
+class ShardedScheduler:
+    def __init__(
+        self,
+        path: str = "scheduler.db",
+        *,
+        workers: int | None = None,
+        pool_size: int = 10,
+        lease: float = LEASE,
+        poll: float = POLL,
+        job_types: dict[JobType, type[Job]] | None = None,
+    ):
+        """Scheduler running jobs in several worker processes
+
+        Jobs are kept in the `path` SQLite store shared by `workers`
+        processes, one per core by default, each running up to
+        `pool_size` jobs in its own `Scheduler`
+        Workers renew leases of their jobs every third of `lease`
+        seconds, jobs of a dead worker are handed over to others once
+        their leases expire and restart from their scheduled state
+        Jobs should be of `job_types` and should not share queues
+        """
+        self.path = path
+        self.workers = workers or os.cpu_count() or 1
+        self.pool_size = pool_size
+        self.lease = lease
+        self.poll = poll
+        self.job_types = JOB_TYPES if job_types is None else job_types
+        self.store = JobStore(path)
+        self.processes: dict[str, multiprocessing.Process] = {}
+        self.context = multiprocessing.get_context("spawn")
+
+    def schedule(self, task: Job):
+        """Stores task with its dependencies, workers pick it up"""
+        self.store.add(task)
+
+    def run(self):
+        """Starts worker processes
+
+        Scheduled jobs left by a previous run are picked up as well
+        """
+        while len(self.processes) < self.workers:
+            owner = f"worker-{uuid.uuid4().hex[:8]}"
+            process = self.context.Process(
+                target=run_worker,
+                args=(
+                    self.path,
+                    owner,
+                    self.job_types,
+                    self.pool_size,
+                    self.lease,
+                    self.poll,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self.processes[owner] = process
+
+    def stop(self):
+        """Stops workers and returns their jobs to the store
+
+        Unfinished jobs run again on the next `run()`
+        """
+        for owner, process in self.processes.items():
+            process.terminate()
+            process.join()
+            self.store.release(owner)
+        self.processes = {}
+
+    def status(self, uid: str) -> tuple[Status, str | None]:
+        """Returns job status and error of a failed job"""
+        return self.store.status(uid)
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Waits until all stored jobs are finished
+
+        Returns False if `timeout` seconds passed first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.store.unfinished() > 0:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll)
+        return True
@@ -1,8 +1,14 @@
 import os
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 
 import pytest
 
 from scheduler import Scheduler
+from tests.helpers import make_body
 
 
 @pytest.fixture
@@ -14,3 +20,65 @@ def clear():
     yield
     if os.path.exists(lockfile):
         os.unlink(lockfile)
+
+
+class LocalHandler(BaseHTTPRequestHandler):
+    """Answers with the requested path
+
+    `?delay=<seconds>` slows the response down
+    `?size=<bytes>` answers with a body of the given size
+    `?status=<code>` answers with the given status
+    Answers 304 when If-None-Match matches the body ETag
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.clients.add(self.client_address)
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            query = parse_qs(urlsplit(self.path).query)
+            time.sleep(float(query.get("delay", [0])[0]))
+            if "size" in query:
+                body = make_body(int(query["size"][0]))
+            else:
+                body = self.path.encode()
+            etag = f'"{zlib.crc32(body):x}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(int(query.get("status", [200])[0]))
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LocalHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.clients = set()
+    server.requests = 0
+    server.in_flight = 0
+    server.max_in_flight = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    server.url = f"http://{host}:{port}"
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,83 @@
+import queue
+import time
+from typing import Any, Callable
+
+from jobs import EmptyJob, Job, WebJob
+
+
+class FakeClock:
+    """Monotonic clock which is moved by hand"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SleepJob(WebJob):
+    """Job which blocks like a slow request"""
+
+    def target(self):
+        time.sleep(0.2)
+        yield
+
+
+class FailingJob(EmptyJob):
+    """Job which always asks for a restart"""
+
+    def target(self):
+        sum(range(1000))
+        self.retry()
+        yield
+
+
+class PassableTargetJob(Job):
+    def __init__(
+        self, target: Callable = None, args: list[Any] = None, **kwargs
+    ):
+        self.new_target = target
+        self.args = args
+        super().__init__(**kwargs)
+        self.queue = queue
+
+    def target(self):
+        return self.new_target(*self.args)
+
+
+def wait_finished(jobs: list[Job], timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(job.is_finished for job in jobs):
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def channel_source(channel_out, items, stats):
+    for item in range(items):
+        while channel_out.full():
+            stats["waits"] += 1
+            yield channel_out.writable()
+        channel_out.put_nowait(item)
+        stats["max_size"] = max(stats["max_size"], channel_out.qsize())
+        yield
+    channel_out.close()
+
+
+def channel_target(channel_in, results):
+    """Slow consumer, which takes two iterations per item"""
+    while True:
+        try:
+            results.append(channel_in.get_nowait())
+        except queue.Empty:
+            if channel_in.closed:
+                break
+            yield channel_in.readable()
+            continue
+        yield
+        yield
+
+
+def make_body(size: int) -> bytes:
+    return (bytes(range(256)) * (size // 256 + 1))[:size]
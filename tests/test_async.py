@@ -0,0 +1,209 @@
+import asyncio
+import json
+import os
+import time
+from queue import Queue
+
+import pytest
+
+from async_scheduler import AsyncScheduler
+from jobs import (
+    AsyncFileJob,
+    Channel,
+    AsyncJob,
+    EmptyJob,
+    InfiniteJob,
+    JobFailed,
+    JobType,
+    ReadMode,
+)
+from tests.helpers import (
+    FailingJob,
+    PassableTargetJob,
+    channel_source,
+    channel_target,
+)
+
+
+class AsyncSleepJob(AsyncJob):
+    """Job which awaits like a slow request"""
+
+    async def target(self):
+        await asyncio.sleep(0.2)
+        yield
+
+
+class TestAsyncScheduler:
+    TEST_FILE = "async_file.txt"
+
+    @pytest.fixture
+    def clear_files(self):
+        yield
+        if os.path.exists(self.TEST_FILE):
+            os.unlink(self.TEST_FILE)
+
+    def test_overlap(self, clear):
+        jobs = [AsyncSleepJob() for _ in range(100)]
+        scheduler = AsyncScheduler(pool_size=len(jobs))
+        scheduler.run()
+        start = time.monotonic()
+        [scheduler.schedule(job) for job in jobs]
+        scheduler.join()
+
+        assert all(job.is_finished for job in jobs)
+        assert time.monotonic() - start < 0.2 * 5
+
+    def test_pool_size(self, clear):
+        jobs = [InfiniteJob() for _ in range(11)]
+        scheduler = AsyncScheduler()
+        [scheduler.schedule(job) for job in jobs]
+        scheduler.pause()
+
+        assert len(scheduler.tasks_active) == 10
+        assert len(scheduler.tasks_wait) == 1
+        scheduler.stop()
+
+    def test_schedule_many(self, clear):
+        jobs = (AsyncSleepJob() for _ in range(20))
+        scheduler = AsyncScheduler(pool_size=20)
+        scheduler.run()
+        scheduler.schedule_many(jobs)
+        scheduler.join()
+
+        assert len(scheduler.tasks_active) == 0
+        assert len(scheduler.graph) == 0
+
+    def test_schedule_from_step(self, clear):
+        child = EmptyJob()
+
+        class SpawningJob(EmptyJob):
+            def target(self):
+                AsyncScheduler().schedule(child)
+                yield
+
+        scheduler = AsyncScheduler()
+        scheduler.schedule(SpawningJob())
+        scheduler.join()
+
+        assert child.is_finished
+
+    def test_schedule_paused(self, clear):
+        job = EmptyJob()
+        scheduler = AsyncScheduler()
+        scheduler.pause()
+        scheduler.schedule(job)
+        time.sleep(0.05)
+        assert not job.is_finished
+
+        scheduler.run()
+        scheduler.join()
+        assert job.is_finished
+
+    def test_futures(self, clear):
+        job = AsyncSleepJob()
+        scheduler = AsyncScheduler()
+        done = scheduler.schedule(job)
+        failed = scheduler.schedule(FailingJob(tries=1))
+        cancelled = scheduler.schedule(InfiniteJob())
+
+        assert done.result(timeout=1) is job
+        with pytest.raises(JobFailed):
+            failed.result(timeout=1)
+        scheduler.stop()
+        assert cancelled.cancelled()
+
+    def test_join_timeout(self, clear):
+        scheduler = AsyncScheduler()
+        scheduler.schedule(InfiniteJob())
+        start = time.monotonic()
+
+        assert not scheduler.join(timeout=0.1)
+        assert time.monotonic() - start < 0.5
+        scheduler.stop()
+
+    def test_dependencies(self, clear):
+        first = AsyncSleepJob()
+        second = EmptyJob(dependencies=[first])
+        scheduler = AsyncScheduler()
+        scheduler.schedule(second)
+        scheduler.pause()
+
+        assert scheduler.tasks_active == [first]
+        assert scheduler.graph.blocked == [second]
+
+        scheduler.run()
+        scheduler.join()
+        assert first.is_finished and second.is_finished
+
+    def test_file(self, clear, clear_files):
+        queue = Queue()
+        queue.put("test_async")
+        scheduler = AsyncScheduler()
+        writer = AsyncFileJob(actions=[("w", self.TEST_FILE)], queue=queue)
+        reader = AsyncFileJob(
+            actions=[("r", self.TEST_FILE)], queue=queue, dependencies=[writer]
+        )
+        scheduler.schedule(reader)
+        scheduler.join()
+
+        assert queue.get() == "test_async"
+
+    def test_stop_restart(self, clear):
+        active = 5
+        waiting = 4
+        jobs = [InfiniteJob() for _ in range(active + waiting)]
+        scheduler = AsyncScheduler(pool_size=active)
+        [scheduler.schedule(job) for job in jobs]
+        scheduler.stop()
+
+        with open("scheduler.lock", "r") as file:
+            data = json.load(file)
+        assert len(data["active"]) == active
+        assert len(data["waiting"]) == waiting
+        for job in data["active"]:
+            assert job["type"] == JobType.INFINITE
+
+        scheduler.restart()
+        scheduler.pause()
+        assert len(scheduler.tasks_active) == active
+        assert len(scheduler.tasks_wait) == waiting
+        scheduler.stop()
+
+    def test_file_chunks(self, clear, clear_files):
+        with open(self.TEST_FILE, "w") as file:
+            file.write("x" * 100)
+        queue = Queue()
+        scheduler = AsyncScheduler()
+        job = AsyncFileJob(
+            actions=[("r", self.TEST_FILE)],
+            queue=queue,
+            read_mode=ReadMode.CHUNKS,
+            read_size=30,
+        )
+        scheduler.schedule(job)
+        scheduler.join()
+
+        assert [len(queue.get()) for _ in range(queue.qsize())] == [
+            30,
+            30,
+            30,
+            10,
+        ]
+
+    def test_channel_park(self, clear):
+        channel = Channel(2)
+        stats = {"waits": 0, "max_size": 0}
+        results = []
+        scheduler = AsyncScheduler()
+        scheduler.schedule(
+            PassableTargetJob(target=channel_target, args=(channel, results))
+        )
+        scheduler.schedule(
+            PassableTargetJob(
+                target=channel_source, args=(channel, 20, stats)
+            )
+        )
+        scheduler.join()
+
+        assert results == list(range(20))
+        assert 0 < stats["waits"] <= 20
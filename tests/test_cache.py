@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+
+from jobs import FileJob, HttpSession, ManualClock, ResultCache, WebJob
+from scheduler import Scheduler
+from tests.helpers import FakeClock
+
+
+class TestResultCache:
+    def test_lru_eviction(self):
+        cache = ResultCache(max_size=10)
+        cache.put("a", "aaaa", 4)
+        cache.put("b", "bbbb", 4)
+        cache.lookup("a")
+        cache.put("c", "cccc", 4)
+
+        assert cache.lookup("b") is None
+        assert cache.lookup("a").value == "aaaa"
+        assert cache.size == 8
+
+        cache.put("huge", "x" * 11, 11)
+        assert cache.lookup("huge") is None
+        assert len(cache) == 2
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = ResultCache(ttl=1.0, clock=clock)
+        cache.put("a", "value", 5)
+        assert cache.hit(cache.lookup("a"))
+
+        clock.now = 1.5
+        entry = cache.lookup("a")
+        assert not cache.hit(entry)
+        cache.touch("a")
+        assert cache.hit(cache.lookup("a"))
+        assert (cache.hits, cache.misses) == (2, 1)
+
+    def test_load_validators(self):
+        cache = ResultCache()
+        loads = []
+
+        def load():
+            loads.append(1)
+            return f"v{len(loads)}"
+
+        assert cache.load("key", {"size": 1}, load) == "v1"
+        assert cache.load("key", {"size": 1}, load) == "v1"
+        assert cache.load("key", {"size": 2}, load) == "v2"
+        assert len(loads) == 2
+
+    def test_load_coalesced(self):
+        cache = ResultCache()
+        loads = []
+        started = threading.Event()
+
+        def load():
+            loads.append(1)
+            started.set()
+            time.sleep(0.1)
+            return "value"
+
+        with ThreadPoolExecutor(4) as executor:
+            first = executor.submit(cache.load, "key", {}, load)
+            started.wait()
+            others = [
+                executor.submit(cache.load, "key", {}, load) for _ in range(3)
+            ]
+            results = [future.result() for future in [first, *others]]
+
+        assert results == ["value"] * 4
+        assert len(loads) == 1
+        assert cache.coalesced == 3
+
+
+class TestFileJobCache:
+    TEST_FILE = "cached.txt"
+
+    def test_reread_changed(self, clear):
+        cache = ResultCache()
+        queue = Queue()
+        with open(self.TEST_FILE, "w") as file:
+            file.write("first")
+        try:
+            actions = [("r", self.TEST_FILE)]
+            for _ in range(2):
+                list(FileJob(actions, queue, cache=cache).target())
+            with open(self.TEST_FILE, "a") as file:
+                file.write(" and second")
+            list(FileJob(actions, queue, cache=cache).target())
+        finally:
+            os.unlink(self.TEST_FILE)
+
+        assert [queue.get() for _ in range(3)] == [
+            "first",
+            "first",
+            "first and second",
+        ]
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_size_in_bytes(self, clear):
+        cache = ResultCache()
+        queue = Queue()
+        with open(self.TEST_FILE, "w", encoding="utf-8") as file:
+            file.write("привет")
+        try:
+            list(FileJob([("r", self.TEST_FILE)], queue, cache=cache).target())
+        finally:
+            os.unlink(self.TEST_FILE)
+
+        assert queue.get() == "привет"
+        assert cache.size == len("привет".encode())
+
+    def test_scheduler_cache(self, clear):
+        cache = ResultCache()
+        scheduler = Scheduler(cache=cache, clock=ManualClock())
+        job = FileJob([], Queue())
+        job.attach(scheduler)
+
+        assert job.cache is cache
+
+
+class TestWebJobCache:
+    def test_fresh_hit(self, http_server):
+        cache = ResultCache()
+        session = HttpSession()
+        url = f"{http_server.url}/page"
+        for _ in range(3):
+            job = WebJob([url], Queue(), session=session, cache=cache)
+            list(job.target())
+
+        assert http_server.requests == 1
+        assert cache.hits == 2
+
+    def test_revalidate(self, http_server):
+        clock = FakeClock()
+        cache = ResultCache(ttl=1.0, clock=clock)
+        session = HttpSession()
+        url = f"{http_server.url}/page"
+        queue = Queue()
+        list(WebJob([url], queue, session=session, cache=cache).target())
+        clock.now = 2.0
+        list(WebJob([url], queue, session=session, cache=cache).target())
+
+        assert http_server.requests == 2
+        assert [queue.get(), queue.get()] == [b"/page", b"/page"]
+        assert cache.hit(cache.lookup(("web", url)))
+
+    def test_coalesced(self, http_server):
+        cache = ResultCache()
+        session = HttpSession()
+        url = f"{http_server.url}/page?delay=0.2"
+        futures = [session.submit(url, cache) for _ in range(4)]
+
+        assert len({id(future) for future in futures}) == 1
+        assert futures[0].result().content == b"/page?delay=0.2"
+        assert http_server.requests == 1
+        assert cache.coalesced == 3
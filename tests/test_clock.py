@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+import pytz
+
+from jobs import Clock, EmptyJob, Job, ManualClock
+from scheduler import Scheduler
+from tests.helpers import wait_finished
+
+
+class SlowStepJob(EmptyJob):
+    """Job which steps take two seconds of manual time"""
+
+    def target(self):
+        while True:
+            self.clock.advance(2)
+            yield
+
+
+class TestClock:
+    def test_time_zone(self):
+        clock = Clock("UTC")
+
+        assert clock.now().tzinfo is pytz.utc
+        assert clock.now().utcoffset() == timedelta(0)
+
+    def test_manual_clock(self):
+        clock = ManualClock()
+        start = clock.now()
+        clock.advance(1.5)
+
+        assert clock.now() - start == timedelta(seconds=1.5)
+        assert clock.monotonic() == 1.5
+
+    def test_timeout(self):
+        job = SlowStepJob(max_working_time=3, tries=1, clock=ManualClock())
+        steps = 0
+        while not job.is_finished:
+            job.run()
+            steps += 1
+
+        assert job.tries_left == 0
+        assert steps == 4
+
+
+class TestSchedulerClock:
+    def test_fast_forward(self, clear):
+        clock = ManualClock()
+        job = EmptyJob(start_at=clock.now() + timedelta(hours=1))
+        scheduler = Scheduler(clock=clock)
+        scheduler.run()
+        scheduler.schedule(job)
+
+        assert not wait_finished([job], timeout=0.2)
+        clock.advance(3600)
+        assert wait_finished([job], timeout=1)
+
+    def test_job_starts_by_scheduler_clock(self, clear):
+        clock = ManualClock(Job.now() - timedelta(days=1))
+        job = EmptyJob()
+        scheduler = Scheduler(clock=clock)
+        scheduler.schedule(job)
+        scheduler.pause()
+
+        assert job.time_start == clock.now()
+        assert job.clock is clock
@@ -0,0 +1,108 @@
+import io
+from datetime import timedelta
+
+import pytest
+
+from jobs import (
+    JOB_TYPES,
+    BinaryCodec,
+    Channel,
+    EmptyJob,
+    FileJob,
+    InfiniteJob,
+    Job,
+    JsonCodec,
+    restore_jobs,
+)
+from scheduler import Scheduler, read_lockfile, write_lockfile
+
+CODECS = [JsonCodec(), BinaryCodec()]
+
+
+class TestCodecs:
+    @pytest.mark.parametrize("codec", CODECS)
+    def test_roundtrip(self, codec):
+        value = {
+            "none": None,
+            "flags": [True, False],
+            "ints": [0, 127, 128, -1, -32, -33, 2**40, -(2**40)],
+            "float": 0.25,
+            "strings": ["", "short", "ю" * 100],
+            "bytes": b"\x00\xff" * 50,
+            "nested": {str(key): [key] for key in range(20)},
+            "moment": Job.now(),
+        }
+
+        assert codec.loads(codec.dumps(value)) == value
+
+    @pytest.mark.parametrize("codec", CODECS)
+    def test_bytes_like(self, codec):
+        value = [bytearray(b"array"), memoryview(b"view")]
+
+        assert codec.loads(codec.dumps(value)) == [b"array", b"view"]
+
+    @pytest.mark.parametrize("codec", CODECS)
+    def test_references(self, codec):
+        channel = Channel(4)
+        channel.put(b"item")
+        first = FileJob([("w", "out.txt")], channel)
+        second = FileJob([("r", "in.txt")], channel, dependencies=[first])
+        states = [
+            codec.loads(data, refs)
+            for refs in [{}]
+            for data in [
+                codec.dumps(first.serialize()),
+                codec.dumps(second.serialize()),
+            ]
+        ]
+
+        restored = list(restore_jobs(states, JOB_TYPES))
+
+        assert [job.uid for job in restored] == [first.uid, second.uid]
+        assert restored[1].dependencies == [restored[0]]
+        assert restored[0].queue is restored[1].queue
+        assert isinstance(restored[0].queue, Channel)
+        assert restored[0].queue.get_nowait() == b"item"
+
+    @pytest.mark.parametrize("codec", CODECS)
+    def test_partial_record(self, codec):
+        file = io.BytesIO()
+        codec.write_record(file, {"uid": "first"})
+        codec.write_record(file, {"uid": "second"})
+        file = io.BytesIO(file.getvalue()[:-3])
+
+        assert list(codec.read_records(file)) == [{"uid": "first"}]
+
+    def test_binary_is_compact(self, tmp_path):
+        jobs = [EmptyJob(tries=3) for _ in range(100)]
+        sizes = []
+        for codec in CODECS:
+            path = tmp_path / type(codec).__name__
+            write_lockfile(str(path), jobs[:10], jobs[10:], codec)
+            sizes.append(path.stat().st_size)
+            restored = list(read_lockfile(str(path), JOB_TYPES, codec))
+            assert [job.uid for job in restored] == [job.uid for job in jobs]
+
+        json_size, binary_size = sizes
+        assert binary_size < json_size * 0.75
+
+
+class TestSchedulerCodec:
+    def test_binary_restart(self, clear):
+        start_at = Job.now() + timedelta(hours=1)
+        delayed = InfiniteJob(start_at=start_at)
+        blocked = EmptyJob(dependencies=[delayed])
+        active = InfiniteJob()
+        scheduler = Scheduler(codec=BinaryCodec())
+        [scheduler.schedule(job) for job in [active, blocked]]
+        scheduler.stop()
+
+        scheduler.restart()
+        scheduler.pause()
+
+        assert [job.uid for job in scheduler.tasks_active] == [active.uid]
+        _, _, restored = scheduler.tasks_delayed[0]
+        assert restored.uid == delayed.uid
+        assert restored.start_at == start_at
+        assert [job.uid for job in scheduler.graph.blocked] == [blocked.uid]
+        assert scheduler.graph.blocked[0].dependencies == [restored]
@@ -1,11 +1,23 @@
 import json
+import threading
+import time
+from datetime import timedelta
 
 import pytest
 
-from jobs import InfiniteJob, JobType
+from jobs import EmptyJob, InfiniteJob, Job, JobType
 from scheduler import Scheduler
 
 
+class SpawningJob(EmptyJob):
+    """Schedules a child job from its step"""
+
+    def target(self):
+        self.child = EmptyJob()
+        self.child_future = Scheduler().schedule(self.child)
+        yield
+
+
 class TestSchedulerCommon:
     @pytest.fixture
     def prepare_lock(self):
@@ -70,3 +82,78 @@ class TestSchedulerCommon:
 
         scheduler.join()
         assert len(scheduler.tasks_active) == 0
+
+    def test_delayed_job_parked(self, clear):
+        job = EmptyJob(start_at=Job.now() + timedelta(seconds=0.5))
+        scheduler = Scheduler()
+        scheduler.run()
+        scheduler.schedule(job)
+        scheduler.pause()
+
+        assert len(scheduler.tasks_active) == 0
+        assert len(scheduler.tasks_delayed) == 1
+
+        scheduler.run()
+        scheduler.join()
+        assert job.is_finished
+        assert Job.now() >= job.time_start
+
+    def test_resume_from_other_thread(self, clear):
+        scheduler = Scheduler()
+        scheduler.run()
+        pausing = threading.Thread(target=scheduler.pause)
+        pausing.start()
+        pausing.join()
+        job = EmptyJob()
+        future = scheduler.schedule(job)
+        time.sleep(0.05)
+        assert not job.is_finished
+
+        resuming = threading.Thread(target=scheduler.run)
+        resuming.start()
+        resuming.join(timeout=1)
+        assert not resuming.is_alive()
+        assert future.result(timeout=1) is job
+
+    def test_schedule_from_step(self, clear):
+        scheduler = Scheduler()
+        scheduler.run()
+        job = SpawningJob()
+        scheduler.schedule(job)
+
+        assert scheduler.join(timeout=2)
+        assert job.child_future.result(timeout=1) is job.child
+
+    def test_schedule_wakes_event_loop(self, clear):
+        scheduler = Scheduler()
+        scheduler.run()
+        time.sleep(0.1)
+        job = EmptyJob()
+        scheduler.schedule(job)
+
+        deadline = time.monotonic() + 0.1
+        while not job.is_finished and time.monotonic() < deadline:
+            time.sleep(0.001)
+        assert job.is_finished
+
+
+class TestJobState:
+    def test_state_captured_on_demand(self, monkeypatch):
+        job = InfiniteJob()
+        captured = []
+        capture_state = InfiniteJob._capture_state
+        monkeypatch.setattr(
+            InfiniteJob,
+            "_capture_state",
+            lambda self: captured.append(1) or capture_state(self),
+        )
+        for _ in range(10):
+            job.run()
+
+        assert captured == []
+        job.serialize()
+        job.serialize()
+        assert len(captured) == 1
+        job.run()
+        job.serialize()
+        assert len(captured) == 2
@@ -1,24 +1,12 @@
 import os
 import queue
-from typing import Any, Callable
+import time
 
 import pytest
 
-from jobs import Job
+from jobs import Channel
 from scheduler import Scheduler
-
-
-class PassableTargetJob(Job):
-    def __init__(
-        self, target: Callable = None, args: list[Any] = None, **kwargs
-    ):
-        self.new_target = target
-        self.args = args
-        super().__init__(**kwargs)
-        self.queue = queue
-
-    def target(self):
-        return self.new_target(*self.args)
+from tests.helpers import PassableTargetJob, channel_source, channel_target
 
 
 def source(queue_out):
@@ -80,3 +68,76 @@ class TestConveyorJob:
             assert sum(
                 int(value.strip()) for value in file.readlines()
             ) == sum(x**2 for x in range(10))
+
+
+def channel_processor(channel_in, channel_out, func):
+    while True:
+        try:
+            item = channel_in.get_nowait()
+        except queue.Empty:
+            if channel_in.closed:
+                break
+            yield channel_in.readable()
+            continue
+        while channel_out.full():
+            yield channel_out.writable()
+        channel_out.put_nowait(func(item))
+        yield
+    channel_out.close()
+
+
+class TestChannelConveyor:
+    ITEMS = 100
+    SIZE = 4
+
+    def test_backpressure(self, clear):
+        channel_in = Channel(self.SIZE)
+        channel_out = Channel(self.SIZE)
+        stats = {"waits": 0, "max_size": 0}
+        results = []
+
+        scheduler = Scheduler()
+        scheduler.run()
+        for job in [
+            PassableTargetJob(
+                target=channel_target, args=(channel_out, results)
+            ),
+            PassableTargetJob(
+                target=channel_processor,
+                args=(channel_in, channel_out, lambda x: x**2),
+            ),
+            PassableTargetJob(
+                target=channel_source, args=(channel_in, self.ITEMS, stats)
+            ),
+        ]:
+            scheduler.schedule(job)
+        scheduler.join()
+
+        assert results == [x**2 for x in range(self.ITEMS)]
+        assert stats["max_size"] <= self.SIZE
+        assert 0 < stats["waits"] <= self.ITEMS
+
+    def test_parked_until_space(self, clear):
+        channel = Channel(1)
+        channel.put_nowait("item")
+        stats = {"waits": 0, "max_size": 0}
+        job = PassableTargetJob(
+            target=channel_source, args=(channel, 1, stats)
+        )
+
+        scheduler = Scheduler()
+        scheduler.schedule(job)
+        time.sleep(0.1)
+        scheduler.pause()
+        assert scheduler.tasks_parked == {job}
+        assert stats["waits"] == 1
+        scheduler.run()
+
+        assert channel.get() == "item"
+        scheduler.join()
+        assert channel.get() == 0
+        assert stats["waits"] == 1
+
+    def test_channel_bounded(self):
+        with pytest.raises(ValueError):
+            Channel(0)
@@ -3,7 +3,7 @@ from queue import Queue
 
 import pytest
 
-from jobs import FileJob
+from jobs import FileJob, ReadMode
 from scheduler import Scheduler
 
 
@@ -49,3 +49,148 @@ class TestFileJob:
         scheduler.join()
 
         assert queue.get() == "test_read"
+
+
+class TestBufferedFileJob:
+    TEST_FILE = "buffered.txt"
+
+    @pytest.fixture
+    def clear_files(self):
+        yield
+        if os.path.exists(self.TEST_FILE):
+            os.unlink(self.TEST_FILE)
+
+    def test_drain_queue(self, clear_files):
+        queue = Queue()
+        records = [f"{i}\n" for i in range(1000)]
+        [queue.put(record) for record in records]
+        job = FileJob(
+            actions=[("w", self.TEST_FILE)], queue=queue, buffered=True
+        )
+        job.run()
+
+        assert queue.empty()
+        assert len(job.buffers) == 1
+        job.run()
+        assert job.is_finished
+        assert job.buffers == {}
+        with open(self.TEST_FILE) as file:
+            assert file.read() == "".join(records)
+
+    def test_reuse_handle(self, clear_files):
+        queue = Queue()
+        job = FileJob(
+            actions=[("w", self.TEST_FILE), ("a", self.TEST_FILE)],
+            queue=queue,
+            buffered=True,
+            buffer_size=4,
+        )
+        queue.put("ab")
+        job.run()
+        file = job.buffers[self.TEST_FILE].file
+        queue.put(b"cd")
+        job.run()
+
+        assert job.buffers[self.TEST_FILE].file is file
+        with open(self.TEST_FILE) as file:
+            assert file.read() == "abcd"
+
+    def test_flush_on_stop(self, clear_files):
+        queue = Queue()
+        queue.put("pending")
+        job = FileJob(
+            actions=[("a", self.TEST_FILE)] * 2, queue=queue, buffered=True
+        )
+        job.run()
+        with open(self.TEST_FILE) as file:
+            assert file.read() == ""
+
+        job.stop()
+        with open(self.TEST_FILE) as file:
+            assert file.read() == "pending"
+
+    def test_scheduler(self, clear, clear_files):
+        queue = Queue()
+        [queue.put(f"{i}\n") for i in range(100)]
+        job = FileJob(
+            actions=[("a", self.TEST_FILE)], queue=queue, buffered=True
+        )
+        scheduler = Scheduler()
+        scheduler.schedule(job)
+        scheduler.join()
+
+        with open(self.TEST_FILE) as file:
+            assert len(file.readlines()) == 100
+
+
+class TestStreamingRead:
+    TEST_FILE = "big.txt"
+    LINES = [f"line {i}\n" for i in range(100)]
+
+    @pytest.fixture
+    def big_file(self):
+        with open(self.TEST_FILE, "w") as file:
+            file.writelines(self.LINES)
+        yield
+        if os.path.exists(self.TEST_FILE):
+            os.unlink(self.TEST_FILE)
+
+    @staticmethod
+    def drain(queue: Queue) -> list:
+        return [queue.get() for _ in range(queue.qsize())]
+
+    def test_chunks(self, big_file):
+        queue = Queue()
+        job = FileJob(
+            actions=[("r", self.TEST_FILE)],
+            queue=queue,
+            read_mode=ReadMode.CHUNKS,
+            read_size=64,
+        )
+        steps = list(job.target())
+
+        chunks = self.drain(queue)
+        assert len(steps) == len(chunks) > 1
+        assert all(len(chunk) <= 64 for chunk in chunks)
+        assert b"".join(chunks) == "".join(self.LINES).encode()
+
+    def test_lines(self, big_file):
+        queue = Queue()
+        job = FileJob(
+            actions=[("r", self.TEST_FILE)],
+            queue=queue,
+            read_mode=ReadMode.LINES,
+        )
+        list(job.target())
+
+        assert self.drain(queue) == self.LINES
+
+    def test_mmap(self, big_file):
+        queue = Queue()
+        job = FileJob(
+            actions=[("r", self.TEST_FILE)],
+            queue=queue,
+            read_mode=ReadMode.MMAP,
+            read_size=100,
+        )
+        list(job.target())
+
+        views = self.drain(queue)
+        assert all(isinstance(view, memoryview) for view in views)
+        assert all(len(view) <= 100 for view in views)
+        assert b"".join(views) == "".join(self.LINES).encode()
+
+    def test_bounded_queue(self, big_file):
+        queue = Queue(maxsize=1)
+        job = FileJob(
+            actions=[("r", self.TEST_FILE)],
+            queue=queue,
+            read_mode=ReadMode.LINES,
+        )
+        lines = []
+        for part in job.target():
+            if part is None:
+                lines.append(queue.get())
+        lines.extend(self.drain(queue))
+
+        assert lines == self.LINES
@@ -0,0 +1,133 @@
+import time
+
+import pytest
+
+from graph import DependencyCycleError
+from jobs import EmptyJob, InfiniteJob, JobFailed
+from scheduler import Scheduler
+from tests.helpers import FailingJob, SleepJob
+
+
+class TestFutures:
+    def test_result(self, clear):
+        job = EmptyJob()
+        scheduler = Scheduler()
+        scheduler.run()
+        future = scheduler.schedule(job)
+
+        assert future.result(timeout=1) is job
+        assert job.is_finished
+
+    def test_failure(self, clear):
+        scheduler = Scheduler()
+        scheduler.run()
+        future = scheduler.schedule(FailingJob(tries=1))
+
+        with pytest.raises(JobFailed):
+            future.result(timeout=1)
+
+    def test_stop_cancels(self, clear):
+        scheduler = Scheduler()
+        scheduler.run()
+        future = scheduler.schedule(InfiniteJob())
+        scheduler.stop()
+
+        assert future.cancelled()
+
+    def test_callback_may_schedule(self, clear):
+        scheduler = Scheduler()
+        scheduler.run()
+        follow_up = EmptyJob()
+        future = scheduler.schedule(EmptyJob())
+        future.add_done_callback(lambda _: scheduler.schedule(follow_up))
+        future.result(timeout=1)
+
+        assert scheduler.join(timeout=1)
+        assert follow_up.is_finished
+
+
+class TestJoin:
+    def test_join_wakes_immediately(self, clear):
+        scheduler = Scheduler()
+        scheduler.run()
+        [scheduler.schedule(EmptyJob()) for _ in range(10)]
+        start = time.monotonic()
+        scheduler.join()
+
+        assert time.monotonic() - start < 0.1
+
+    def test_join_timeout(self, clear):
+        scheduler = Scheduler()
+        scheduler.run()
+        scheduler.schedule(InfiniteJob())
+        start = time.monotonic()
+
+        assert not scheduler.join(timeout=0.1)
+        assert time.monotonic() - start < 0.5
+        scheduler.stop()
+
+    def test_wait_any(self, clear):
+        scheduler = Scheduler()
+        scheduler.run()
+        slow = scheduler.schedule(SleepJob())
+        fast = scheduler.schedule(EmptyJob())
+
+        assert scheduler.wait_any(timeout=1) == {fast}
+        assert scheduler.wait_any([slow], timeout=1) == {slow}
+
+
+class TestScheduleMany:
+    def test_generator(self, clear):
+        scheduler = Scheduler()
+        scheduler.run()
+        first = EmptyJob()
+        jobs = (
+            EmptyJob(dependencies=[first]) if index % 2 else EmptyJob()
+            for index in range(1000)
+        )
+        futures = scheduler.schedule_many(jobs)
+
+        assert len(futures) == 1000
+        assert scheduler.join(timeout=5)
+        assert first.is_finished
+        assert all(future.result().is_finished for future in futures)
+
+    def test_slow_generator(self, clear):
+        scheduler = Scheduler()
+        running = InfiniteJob()
+        scheduler.schedule(running)
+        progressed = []
+
+        def jobs():
+            steps = running.stats.steps
+            time.sleep(0.1)
+            progressed.append(running.stats.steps > steps)
+            yield EmptyJob()
+
+        scheduler.schedule_many(jobs())
+        assert progressed == [True]
+        scheduler.stop()
+
+    def test_paused(self, clear):
+        scheduler = Scheduler(pool_size=2)
+        scheduler.pause()
+        jobs = [InfiniteJob() for _ in range(5)]
+        futures = scheduler.schedule_many(jobs)
+
+        assert [future.done() for future in futures] == [False] * 5
+        assert list(scheduler.tasks_active) == jobs[:2]
+        assert len(scheduler.tasks_wait) == 3
+        scheduler.stop()
+
+    def test_cycle(self, clear):
+        scheduler = Scheduler()
+        scheduler.pause()
+        first = EmptyJob()
+        looped = EmptyJob()
+        looped.dependencies = [looped]
+
+        with pytest.raises(DependencyCycleError):
+            scheduler.schedule_many([first, looped, EmptyJob()])
+        assert first in scheduler.graph
+        assert looped not in scheduler.graph
+        scheduler.stop()
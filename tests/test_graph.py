@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+import pytest
+
+from graph import DependencyCycleError, JobGraph
+from jobs import EmptyJob, Job
+from scheduler import Scheduler
+
+
+class TestJobGraph:
+    def test_topological_order(self):
+        first = EmptyJob()
+        second = EmptyJob(dependencies=[first])
+        third = EmptyJob(dependencies=[first, second])
+        graph = JobGraph()
+
+        assert graph.add(third) == [first, second, third]
+        assert graph.is_ready(first)
+        assert graph.blocked == [second, third]
+
+        assert graph.finish(first) == [second]
+        assert graph.finish(second) == [third]
+        assert graph.finish(third) == []
+        assert len(graph) == 0
+
+    def test_shared_dependency(self):
+        shared = EmptyJob()
+        left = EmptyJob(dependencies=[shared])
+        right = EmptyJob(dependencies=[shared])
+        graph = JobGraph()
+
+        assert graph.add(left) == [shared, left]
+        assert graph.add(right) == [right]
+        assert graph.add(right) == []
+        assert graph.finish(shared) == [left, right]
+
+    def test_finished_dependency(self):
+        done = EmptyJob()
+        done.is_finished = True
+        job = EmptyJob(dependencies=[done])
+        graph = JobGraph()
+
+        assert graph.add(job) == [job]
+        assert graph.is_ready(job)
+
+    def test_cycle(self):
+        first = EmptyJob()
+        second = EmptyJob(dependencies=[first])
+        first.dependencies.append(second)
+        graph = JobGraph()
+
+        with pytest.raises(DependencyCycleError):
+            graph.add(second)
+        assert len(graph) == 0
+
+
+class TestSchedulerDependencies:
+    def test_blocked_jobs_wait(self, clear):
+        shared = EmptyJob(start_at=Job.now() + timedelta(seconds=0.3))
+        jobs = [EmptyJob(dependencies=[shared]) for _ in range(3)]
+        scheduler = Scheduler()
+        [scheduler.schedule(job) for job in jobs]
+        scheduler.pause()
+
+        assert list(scheduler.tasks_active) == []
+        assert len(scheduler.tasks_delayed) == 1
+        assert len(scheduler.graph.blocked) == len(jobs)
+
+        scheduler.run()
+        scheduler.join()
+        assert all(job.is_finished for job in [shared, *jobs])
+        assert len(scheduler.tasks_active) == 0
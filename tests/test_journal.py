@@ -0,0 +1,116 @@
+import time
+from datetime import timedelta
+
+import pytest
+
+from jobs import JOB_TYPES, EmptyJob, InfiniteJob, Job
+from journal import Journal
+from scheduler import Scheduler
+from tests.helpers import FailingJob
+
+
+class TestJournal:
+    @pytest.fixture
+    def path(self, tmp_path):
+        return str(tmp_path / "scheduler.journal")
+
+    def test_replay(self, path):
+        first = EmptyJob()
+        second = EmptyJob(dependencies=[first])
+        journal = Journal(path)
+        journal.schedule(first)
+        journal.schedule(second)
+        journal.start(first)
+        journal.finish(first)
+        journal.close()
+
+        records = Journal(path).replay()
+
+        assert list(records) == [second.uid]
+        assert not records[second.uid]["started"]
+
+    def test_restore(self, path):
+        start_at = Job.now() + timedelta(hours=1)
+        first = InfiniteJob(start_at=start_at)
+        second = EmptyJob(dependencies=[first], tries=3)
+        journal = Journal(path)
+        journal.schedule(first)
+        journal.schedule(second)
+        journal.start(first)
+        second.tries_left = 1
+        journal.retry(second)
+        journal.close()
+
+        restored = list(Journal(path).restore(JOB_TYPES))
+
+        assert [job.uid for job in restored] == [first.uid, second.uid]
+        assert restored[0].start_at == start_at
+        assert restored[1].tries == 1
+        assert restored[1].dependencies == [restored[0]]
+
+    def test_compaction(self, path):
+        jobs = [EmptyJob() for _ in range(10)]
+        journal = Journal(path, compact_every=4)
+        for job in jobs:
+            journal.schedule(job)
+        for job in jobs[:5]:
+            journal.finish(job)
+        journal.close()
+
+        with open(path, "r") as file:
+            assert len(file.readlines()) < 4
+        records = Journal(path).replay()
+        assert list(records) == [job.uid for job in jobs[5:]]
+
+    def test_compaction_amortized(self, path, caplog):
+        journal = Journal(path, compact_every=1)
+        with caplog.at_level("INFO", logger="journal"):
+            for _ in range(100):
+                journal.schedule(EmptyJob())
+        journal.close()
+
+        compactions = [
+            record
+            for record in caplog.records
+            if record.getMessage().startswith("journal: compacted")
+        ]
+        assert len(compactions) <= 8
+        assert len(Journal(path).replay()) == 100
+
+
+class TestSchedulerJournal:
+    def test_restart_after_crash(self, clear, tmp_path):
+        path = str(tmp_path / "scheduler.journal")
+        jobs = [InfiniteJob() for _ in range(3)]
+        done = EmptyJob()
+        scheduler = Scheduler(journal=Journal(path))
+        scheduler.run()
+        [scheduler.schedule(job) for job in [*jobs, done]]
+        deadline = time.monotonic() + 1
+        while done in scheduler.graph and time.monotonic() < deadline:
+            time.sleep(0.01)
+        scheduler.pause()
+
+        Scheduler._instances.clear()
+        scheduler = Scheduler(journal=Journal(path))
+        scheduler.restart()
+        scheduler.pause()
+
+        assert {job.uid for job in scheduler.tasks_active} == {
+            job.uid for job in jobs
+        }
+
+    def test_retry_recorded(self, clear, tmp_path):
+        path = str(tmp_path / "scheduler.journal")
+        job = FailingJob(tries=2)
+        journal = Journal(path)
+        scheduler = Scheduler(journal=journal)
+        scheduler.run()
+        scheduler.schedule(job)
+        scheduler.join()
+
+        assert job.tries_left == 0
+        assert Journal(path).replay() == {}
+        with open(path, "r") as file:
+            events = [line for line in file if '"retry"' in line]
+        assert len(events) == 2
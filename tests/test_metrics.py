@@ -0,0 +1,108 @@
+import urllib.request
+from datetime import timedelta
+
+from jobs import EmptyJob, InfiniteJob, Job
+from metrics import CONTENT_TYPE, Counter, Histogram, Metrics
+from scheduler import Scheduler
+from tests.helpers import FailingJob
+
+
+class TestMetrics:
+    def test_histogram(self):
+        histogram = Histogram("step_seconds", "Step", ("job_type",), (1, 2))
+        for value in [0.5, 1.5, 1.5, 3]:
+            histogram.observe(value, "empty")
+
+        assert histogram.render().splitlines() == [
+            "# HELP step_seconds Step",
+            "# TYPE step_seconds histogram",
+            'step_seconds_bucket{job_type="empty",le="1"} 1',
+            'step_seconds_bucket{job_type="empty",le="2"} 3',
+            'step_seconds_bucket{job_type="empty",le="+Inf"} 4',
+            'step_seconds_sum{job_type="empty"} 6.5',
+            'step_seconds_count{job_type="empty"} 4',
+        ]
+
+    def test_counter_escapes_labels(self):
+        counter = Counter("errors_total", "Errors", ("message",))
+        counter.inc('say "hi"', amount=2)
+
+        assert counter.render().splitlines()[-1] == (
+            'errors_total{message="say \\"hi\\""} 2'
+        )
+
+    def test_value_precision(self):
+        counter = Counter("busy_seconds_total", "Busy")
+        counter.inc(amount=1234567.125)
+        counter.inc(amount=1e-7)
+
+        assert counter.render().splitlines()[-1] == (
+            f"busy_seconds_total {1234567.125 + 1e-7!r}"
+        )
+
+    def test_write(self, tmp_path):
+        metrics = Metrics()
+        metrics.retry(EmptyJob())
+        path = tmp_path / "scheduler.prom"
+        metrics.write(str(path))
+
+        assert 'scheduler_retries_total{job_type="empty"} 1' in (
+            path.read_text().splitlines()
+        )
+
+    def test_serve(self):
+        metrics = Metrics()
+        metrics.finish(EmptyJob())
+        server = metrics.serve()
+        try:
+            host, port = server.server_address
+            url = f"http://{host}:{port}/metrics"
+            with urllib.request.urlopen(url, timeout=1) as response:
+                body = response.read().decode()
+                content_type = response.headers["Content-Type"]
+        finally:
+            server.shutdown()
+
+        assert content_type == CONTENT_TYPE
+        assert 'scheduler_jobs_finished_total{job_type="empty"} 1' in body
+
+
+class TestSchedulerMetrics:
+    def test_steps_and_retries(self, clear):
+        scheduler = Scheduler()
+        scheduler.run()
+        scheduler.schedule(EmptyJob())
+        scheduler.schedule(FailingJob(tries=2))
+        assert scheduler.join(timeout=1)
+
+        metrics = scheduler.metrics
+        assert metrics.steps.series[("empty",)][-1] >= 1
+        assert metrics.retries.value("empty") == 2
+        assert metrics.finished.value("empty") == 2
+        assert "scheduler_loop_utilization " in metrics.render()
+
+    def test_timeouts(self, clear):
+        scheduler = Scheduler()
+        scheduler.schedule(InfiniteJob(max_working_time=0.01, tries=1))
+        scheduler.run()
+        assert scheduler.join(timeout=1)
+
+        assert scheduler.metrics.timeouts.value("infinite") == 2
+
+    def test_queue_depths(self, clear):
+        scheduler = Scheduler(pool_size=1)
+        later = Job.now() + timedelta(hours=1)
+        delayed = InfiniteJob(start_at=later)
+        [scheduler.schedule(job) for job in [InfiniteJob(), InfiniteJob()]]
+        scheduler.schedule(EmptyJob(dependencies=[delayed]))
+        scheduler.pause()
+
+        lines = scheduler.metrics.render().splitlines()
+        for state, count in [
+            ("active", 1),
+            ("waiting", 1),
+            ("delayed", 1),
+            ("blocked", 1),
+        ]:
+            assert f'scheduler_jobs{{state="{state}"}} {count}' in lines
+        scheduler.stop()
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from jobs import JobType
+from scheduler import Route, Scheduler
+from tests.helpers import FailingJob, SleepJob, wait_finished
+
+
+class TestWorkerPool:
+    def test_threads(self, clear):
+        jobs = [SleepJob() for _ in range(5)]
+        scheduler = Scheduler(pool_size=len(jobs))
+        scheduler.run()
+        start = time.monotonic()
+        [scheduler.schedule(job) for job in jobs]
+
+        assert wait_finished(jobs, timeout=5)
+        assert time.monotonic() - start < 0.2 * len(jobs) / 2
+
+    def test_loop_route(self, clear):
+        jobs = [SleepJob() for _ in range(3)]
+        scheduler = Scheduler(routes={JobType.WEB: Route.LOOP})
+        scheduler.run()
+        start = time.monotonic()
+        [scheduler.schedule(job) for job in jobs]
+
+        assert wait_finished(jobs, timeout=5)
+        assert time.monotonic() - start >= 0.2 * len(jobs)
+
+    def test_process_tries(self, clear):
+        job = FailingJob(tries=2)
+        scheduler = Scheduler(
+            routes={JobType.EMPTY: Route.PROCESS}, process_pool_size=1
+        )
+        scheduler.run()
+        scheduler.schedule(job)
+        scheduler.join()
+
+        assert job.is_finished
+        assert job.tries_left == 0
+
+    def test_process_pool_required(self, clear):
+        with pytest.raises(ValueError):
+            Scheduler(routes={JobType.EMPTY: Route.PROCESS})
+
+    def test_process_route_picklable(self, clear):
+        with pytest.raises(ValueError):
+            Scheduler(
+                routes={JobType.WEB: Route.PROCESS}, process_pool_size=1
+            )
+
+    def test_stop_shuts_down_pools(self, clear):
+        job = SleepJob()
+        scheduler = Scheduler()
+        scheduler.run()
+        scheduler.schedule(job)
+        assert wait_finished([job], timeout=5)
+        pool = scheduler.thread_pool
+
+        scheduler.stop()
+        assert scheduler.thread_pool is None
+        with pytest.raises(RuntimeError):
+            pool.submit(print)
@@ -0,0 +1,117 @@
+import threading
+import time
+
+from jobs import EmptyJob, JobType
+from scheduler import Overrun, Scheduler
+from tests.helpers import wait_finished
+
+
+class SlowStepsJob(EmptyJob):
+    """Job which steps block for a while, records threads it ran in"""
+
+    def __init__(self, *args, steps: int = 3, delay: float = 0.05, **kwargs):
+        self.steps = steps
+        self.delay = delay
+        self.threads = []
+        super().__init__(*args, **kwargs)
+
+    def target(self):
+        for _ in range(self.steps):
+            self.threads.append(threading.current_thread().name)
+            time.sleep(self.delay)
+            yield
+
+
+class AbandonedStepJob(SlowStepsJob):
+    """Job which records when its steps return and its tries are released"""
+
+    def __init__(self, *args, **kwargs):
+        self.events = []
+        super().__init__(*args, **kwargs)
+
+    def target(self):
+        for _ in range(self.steps):
+            self.events.append("step")
+            time.sleep(self.delay)
+            self.events.append("returned")
+            yield
+
+    def release(self):
+        self.events.append("release")
+
+
+class TestQuantum:
+    def test_overrun_offloaded(self, clear):
+        job = SlowStepsJob()
+        scheduler = Scheduler(quantum=0.01)
+        scheduler.run()
+        scheduler.schedule(job)
+
+        assert wait_finished([job], timeout=2)
+        assert job.stats.overruns == 3
+        assert job.stats.overrun_time > 0.1
+        assert not job.threads[0].startswith("scheduler")
+        assert all(name.startswith("scheduler") for name in job.threads[1:])
+
+    def test_overrun_demoted(self, clear):
+        slow = SlowStepsJob(steps=5)
+        waiting = EmptyJob()
+        scheduler = Scheduler(
+            pool_size=1, quantum=0.01, on_overrun=Overrun.DEMOTE
+        )
+        scheduler.pause()
+        [scheduler.schedule(job) for job in [slow, waiting]]
+        scheduler.run()
+
+        assert wait_finished([waiting], timeout=1)
+        assert not slow.is_finished
+        assert slow.wait_priority == -1
+        assert slow._state.priority == 0
+        assert scheduler.overruns()[slow.uid] is slow.stats
+        assert wait_finished([slow], timeout=2)
+        slow.attach(scheduler)
+        assert slow.wait_priority == 0
+
+    def test_step_cancelled(self, clear):
+        job = SlowStepsJob(steps=1, delay=0.5, max_working_time=0.1)
+        scheduler = Scheduler(routes={JobType.EMPTY: "thread"})
+        scheduler.run()
+        start = time.monotonic()
+        scheduler.schedule(job)
+
+        assert wait_finished([job], timeout=0.4)
+        assert time.monotonic() - start < 0.4
+        assert job.stats.cancelled == 1
+
+    def test_step_deadlines_dropped(self, clear):
+        job = SlowStepsJob(steps=50, delay=0, max_working_time=10)
+        scheduler = Scheduler(routes={JobType.EMPTY: "thread"})
+        scheduler.run()
+        scheduler.schedule(job)
+
+        assert scheduler.join(timeout=2)
+        assert job.stats.cancelled == 0
+        assert scheduler.deadlines == []
+
+    def test_cancelled_step_retried(self, clear):
+        job = SlowStepsJob(steps=1, delay=0.3, max_working_time=0.1, tries=1)
+        scheduler = Scheduler(routes={JobType.EMPTY: "thread"})
+        scheduler.run()
+        scheduler.schedule(job)
+
+        assert wait_finished([job], timeout=1)
+        assert job.stats.cancelled == 2
+        assert job.tries_left == 0
+        assert len(job.threads) == 2
+
+    def test_cancelled_step_released_after_return(self, clear):
+        job = AbandonedStepJob(
+            steps=1, delay=0.3, max_working_time=0.1, tries=1
+        )
+        scheduler = Scheduler(routes={JobType.EMPTY: "thread"})
+        scheduler.schedule(job)
+
+        assert wait_finished([job], timeout=2)
+        time.sleep(0.4)
+        assert job.stats.cancelled == 2
+        assert job.events == ["step", "returned", "release"] * 2
@@ -0,0 +1,143 @@
+import time
+from urllib.parse import urlsplit
+
+import pytest
+
+from jobs import (
+    CircuitBreaker,
+    CircuitOpen,
+    HttpSession,
+    JobFailed,
+    RetryPolicy,
+    WebJob,
+)
+from scheduler import Scheduler
+from tests.helpers import FailingJob, FakeClock
+
+
+class TestRetryPolicy:
+    def test_exponential(self):
+        policy = RetryPolicy(base=0.5, factor=2, max_delay=3, jitter=0)
+
+        assert [policy.delay(attempt) for attempt in range(1, 6)] == [
+            0.5,
+            1.0,
+            2.0,
+            3.0,
+            3.0,
+        ]
+
+    def test_jitter(self):
+        policy = RetryPolicy(base=1, jitter=0.5)
+        delays = [policy.delay(1) for _ in range(100)]
+
+        assert all(0.5 <= delay <= 1 for delay in delays)
+        assert len(set(delays)) > 1
+
+
+class TestCircuitBreaker:
+    def test_open_and_trial(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(threshold=2, cooldown=10, clock=clock)
+        breaker.failure("host")
+        breaker.check("host")
+        breaker.failure("host")
+        with pytest.raises(CircuitOpen) as error:
+            breaker.check("host")
+        assert error.value.retry_after == 10
+
+        clock.now = 10
+        assert breaker.retry_after("host") == 0
+        breaker.check("host")
+        with pytest.raises(CircuitOpen) as error:
+            breaker.check("host")
+        assert error.value.retry_after == 10
+        breaker.failure("host")
+        assert breaker.retry_after("host") == 10
+
+        clock.now = 20
+        breaker.check("host")
+        breaker.success("host")
+        breaker.check("host")
+        breaker.check("host")
+
+    def test_session(self, http_server):
+        clock = FakeClock()
+        breaker = CircuitBreaker(threshold=2, cooldown=10, clock=clock)
+        session = HttpSession(breaker=breaker)
+        url = f"{http_server.url}/page?status=503"
+        for _ in range(2):
+            assert session.submit(url).result().status_code == 503
+        with pytest.raises(CircuitOpen):
+            session.submit(url)
+        assert http_server.requests == 2
+
+        clock.now = 10
+        assert session.submit(url).result().status_code == 503
+        assert http_server.requests == 3
+        assert breaker.retry_after(urlsplit(url).netloc) == 10
+
+    def test_jobs_wait_for_trial(self, http_server):
+        clock = FakeClock()
+        breaker = CircuitBreaker(threshold=1, cooldown=10, clock=clock)
+        session = HttpSession(breaker=breaker)
+        url = f"{http_server.url}/page"
+        host = urlsplit(url).netloc
+        breaker.failure(host)
+        clock.now = 10
+        breaker.check(host)
+        jobs = [
+            WebJob([url] * 2, tries=5, concurrency=2, session=session)
+            for _ in range(3)
+        ]
+        for job in jobs:
+            job.run()
+
+        assert http_server.requests == 0
+        for job in jobs:
+            assert job.error is None
+            assert job.tries_left == 4
+            assert job.time_to_start() > 9
+
+
+class TestBackoff:
+    def test_parked_on_timer_heap(self, clear):
+        policy = RetryPolicy(base=0.2, jitter=0)
+        job = FailingJob(tries=2, retry_policy=policy)
+        scheduler = Scheduler()
+        start = time.monotonic()
+        future = scheduler.schedule(job)
+        time.sleep(0.1)
+
+        assert list(scheduler.tasks_active) == []
+        assert len(scheduler.tasks_delayed) == 1
+        with pytest.raises(JobFailed):
+            future.result(timeout=5)
+        assert time.monotonic() - start >= 0.2 + 0.4
+        # Three tries and the step which finds the generator closed
+        assert job.stats.steps == 4
+
+    def test_scheduler_policy(self, clear):
+        policy = RetryPolicy(base=0.1, jitter=0)
+        job = FailingJob(tries=1)
+        scheduler = Scheduler(retry_policy=policy)
+        start = time.monotonic()
+        scheduler.schedule(job)
+        scheduler.join()
+
+        assert job.retry_policy is policy
+        assert time.monotonic() - start >= 0.1
+
+    def test_circuit_open_delays_retry(self, clear, http_server):
+        breaker = CircuitBreaker(threshold=1, cooldown=0.3)
+        session = HttpSession(breaker=breaker)
+        url = f"{http_server.url}/page?status=503"
+        job = WebJob([url], tries=2, session=session)
+        scheduler = Scheduler(http_session=session)
+        start = time.monotonic()
+        scheduler.schedule(job)
+        scheduler.join()
+
+        assert time.monotonic() - start >= 0.3
+        assert isinstance(job.error, JobFailed)
+        assert http_server.requests == 2
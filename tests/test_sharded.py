@@ -0,0 +1,137 @@
+import time
+from datetime import timedelta
+
+import pytest
+
+from graph import DependencyCycleError
+from jobs import JOB_TYPES, EmptyJob, Job, JobType
+from job_store import JobStore, Status
+from sharded_scheduler import ShardedScheduler
+
+
+class SlowJob(EmptyJob):
+    """Job which takes a while"""
+
+    def target(self):
+        for _ in range(10):
+            time.sleep(0.05)
+            yield
+
+
+SLOW_JOB_TYPES = {**JOB_TYPES, JobType.EMPTY: SlowJob}
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "scheduler.db")
+
+
+class TestJobStore:
+    def test_claim_ready(self, store_path):
+        store = JobStore(store_path)
+        first = EmptyJob()
+        second = EmptyJob(dependencies=[first])
+        later = EmptyJob(start_at=Job.now() + timedelta(hours=1))
+        assert store.add(second) == [first, second]
+        store.add(later)
+
+        claimed = store.claim("a", 10, 60, JOB_TYPES)
+        assert [job.uid for job in claimed] == [first.uid]
+        assert store.claim("b", 10, 60, JOB_TYPES) == []
+
+        store.finish(first.uid, "a", None)
+        [job] = store.claim("b", 10, 60, JOB_TYPES)
+        assert job.uid == second.uid
+        assert job.dependencies == []
+        assert store.status(first.uid) == (Status.FINISHED, None)
+        assert store.unfinished() == 2
+
+    def test_cycle(self, store_path):
+        store = JobStore(store_path)
+        first = EmptyJob()
+        second = EmptyJob(dependencies=[first])
+        first.dependencies.append(second)
+
+        with pytest.raises(DependencyCycleError):
+            store.add(second)
+        assert store.unfinished() == 0
+
+    def test_handover(self, store_path):
+        store = JobStore(store_path)
+        job = EmptyJob(tries=1)
+        store.add(job)
+        store.claim("a", 1, 0.01, JOB_TYPES)
+        time.sleep(0.02)
+
+        [claimed] = store.claim("b", 1, 0.01, JOB_TYPES)
+        assert claimed.tries_left == 0
+        store.finish(job.uid, "a", RuntimeError())
+        assert store.status(job.uid) == (Status.LEASED, None)
+
+        time.sleep(0.02)
+        assert store.claim("c", 1, 60, JOB_TYPES) == []
+        status, error = store.status(job.uid)
+        assert status == Status.FINISHED
+        assert "no tries left" in error
+
+    def test_release(self, store_path):
+        store = JobStore(store_path)
+        job = EmptyJob()
+        store.add(job)
+        store.claim("a", 1, 60, JOB_TYPES)
+        store.release("a")
+
+        [claimed] = store.claim("b", 1, 60, JOB_TYPES)
+        assert claimed.uid == job.uid
+        assert claimed.tries_left == 0
+
+
+class TestShardedScheduler:
+    def test_run(self, store_path):
+        scheduler = ShardedScheduler(store_path, workers=2, pool_size=4)
+        chain = [EmptyJob()]
+        for _ in range(5):
+            chain.append(EmptyJob(dependencies=[chain[-1]]))
+        jobs = [EmptyJob() for _ in range(20)]
+        for job in [*jobs, chain[-1]]:
+            scheduler.schedule(job)
+        scheduler.run()
+        try:
+            assert scheduler.join(timeout=30)
+        finally:
+            scheduler.stop()
+
+        for job in [*jobs, *chain]:
+            assert scheduler.status(job.uid) == (Status.FINISHED, None)
+
+    def test_worker_dies(self, store_path):
+        scheduler = ShardedScheduler(
+            store_path,
+            workers=2,
+            pool_size=1,
+            lease=0.5,
+            job_types=SLOW_JOB_TYPES,
+        )
+        jobs = [SlowJob(tries=1) for _ in range(2)]
+        [scheduler.schedule(job) for job in jobs]
+        scheduler.run()
+        try:
+            owner = None
+            while owner is None:
+                time.sleep(0.01)
+                owner = next(
+                    (
+                        owner
+                        for owner in scheduler.processes
+                        if scheduler.store.renew(owner, 0.5)
+                    ),
+                    None,
+                )
+            scheduler.processes[owner].kill()
+
+            assert scheduler.join(timeout=30)
+        finally:
+            scheduler.stop()
+
+        for job in jobs:
+            assert scheduler.status(job.uid) == (Status.FINISHED, None)
@@ -1,4 +1,5 @@
 import pathlib
+import shutil
 
 import pytest
 
@@ -47,3 +48,68 @@ class TestSystemJob:
         job = SystemJob(max_working_time=3, actions=self.ACTIONS)
         scheduler.schedule(job)
         scheduler.join()
+
+
+class TestBulkSystemJob:
+    ROOT = pathlib.Path("bulk")
+    FILES = [
+        f"bulk/{folder}/{i}.txt" for folder in range(5) for i in range(100)
+    ]
+
+    @pytest.fixture
+    def clear_system(self):
+        yield
+        shutil.rmtree(self.ROOT, ignore_errors=True)
+
+    def test_create_delete(self, clear_system):
+        actions = [
+            *([SystemAction.CREATE, path] for path in self.FILES),
+            *([SystemAction.DELETE, path] for path in self.FILES[::2]),
+        ]
+        job = SystemJob(actions=actions, bulk=True, batch_size=50)
+        progress = list(job.target())
+
+        assert progress[-1] == (len(actions), len(actions))
+        assert len(progress) == 10 + 5
+        remaining = sorted(str(path) for path in self.ROOT.glob("*/*.txt"))
+        assert remaining == sorted(self.FILES[1::2])
+
+    def test_mkdir_cache(self, clear_system, monkeypatch):
+        for folder in range(5):
+            (self.ROOT / str(folder)).mkdir(parents=True)
+        calls = []
+        mkdir = pathlib.Path.mkdir
+
+        def counting_mkdir(self, *args, **kwargs):
+            calls.append(self)
+            return mkdir(self, *args, **kwargs)
+
+        monkeypatch.setattr(pathlib.Path, "mkdir", counting_mkdir)
+        actions = [
+            [SystemAction.CREATE_DIR, "bulk/0"],
+            *([SystemAction.CREATE, path] for path in self.FILES),
+        ]
+        job = SystemJob(actions=actions, bulk=True)
+        list(job.target())
+
+        assert len(calls) == 5
+
+    def test_move_sequential(self, clear_system):
+        actions = [
+            [SystemAction.CREATE, "bulk/a"],
+            [SystemAction.MOVE, "bulk/a", "bulk/b"],
+            [SystemAction.MOVE, "bulk/b", "bulk/c"],
+        ]
+        job = SystemJob(actions=actions, bulk=True)
+        list(job.target())
+
+        assert [path.name for path in self.ROOT.iterdir()] == ["c"]
+
+    def test_scheduler(self, clear, clear_system):
+        actions = [[SystemAction.CREATE, path] for path in self.FILES]
+        scheduler = Scheduler()
+        job = SystemJob(actions=actions, bulk=True)
+        scheduler.schedule(job)
+        scheduler.join()
+
+        assert len(list(self.ROOT.glob("*/*.txt"))) == len(self.FILES)
@@ -0,0 +1,93 @@
+import pytest
+
+from jobs import EmptyJob, Job, JobType, SystemJob, WebJob
+from scheduler import Scheduler
+from wait_queue import WaitQueue
+
+
+class RecordingJob(EmptyJob):
+    """Job which records its name when done"""
+
+    def __init__(self, name: str, finished: list[str], *args, **kwargs):
+        self.name = name
+        self.finished = finished
+        super().__init__(*args, **kwargs)
+
+    def target(self):
+        yield
+        self.finished.append(self.name)
+
+
+@pytest.fixture
+def finished() -> list[str]:
+    return []
+
+
+def pop_all(queue: WaitQueue) -> list[Job]:
+    return [queue.pop() for _ in range(len(queue))]
+
+
+class TestWaitQueue:
+    def test_fifo(self):
+        jobs = [EmptyJob() for _ in range(5)]
+        queue = WaitQueue()
+        [queue.push(job) for job in jobs]
+
+        assert list(queue) == jobs
+        assert pop_all(queue) == jobs
+        assert len(queue) == 0
+
+    def test_priority(self):
+        low = EmptyJob(priority=-1)
+        normal = EmptyJob()
+        high = [EmptyJob(priority=10) for _ in range(2)]
+        queue = WaitQueue()
+        [queue.push(job) for job in [low, normal, *high]]
+
+        assert pop_all(queue) == [*high, normal, low]
+
+    def test_fair_share(self):
+        web = [WebJob([], None) for _ in range(20)]
+        system = [SystemJob([]) for _ in range(5)]
+        queue = WaitQueue()
+        [queue.push(job) for job in [*web, *system]]
+
+        first = pop_all(queue)[:10]
+        assert sum(job in system for job in first) == 5
+
+    def test_weights(self):
+        web = [WebJob([], None) for _ in range(20)]
+        system = [SystemJob([]) for _ in range(20)]
+        queue = WaitQueue({JobType.WEB: 3, JobType.SYSTEM: 1})
+        [queue.push(job) for job in [*web, *system]]
+
+        first = pop_all(queue)[:8]
+        assert sum(job in system for job in first) == 2
+
+    def test_no_credit_for_idle_type(self):
+        web = [WebJob([], None) for _ in range(20)]
+        system = [SystemJob([]) for _ in range(4)]
+        queue = WaitQueue()
+        [queue.push(job) for job in web[:10]]
+        pop_all(queue)
+        [queue.push(job) for job in [*web[10:], *system]]
+
+        first = pop_all(queue)[:4]
+        assert sum(job in system for job in first) == 2
+
+
+class TestSchedulerPriority:
+    def test_promotion_order(self, clear, finished):
+        jobs = [
+            RecordingJob("first", finished),
+            RecordingJob("second", finished),
+            RecordingJob("third", finished),
+            RecordingJob("urgent", finished, priority=1),
+        ]
+        scheduler = Scheduler(pool_size=1)
+        scheduler.pause()
+        [scheduler.schedule(job) for job in jobs]
+        scheduler.run()
+        scheduler.join()
+
+        assert finished == ["first", "urgent", "second", "third"]
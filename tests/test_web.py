@@ -1,8 +1,13 @@
 import json
+import os
+import time
 from queue import Queue
 
-from jobs import JobType, WebJob
+import pytest
+
+from jobs import FileJob, HttpSession, JobType, WebJob
 from scheduler import Scheduler
+from tests.helpers import make_body
 
 URLS_DEFAULT = [
     "https://google.com/",
@@ -80,3 +85,126 @@ class TestWebJob:
             assert "dependencies" in body
             assert "urls" in body
             assert "queue" in body
+
+
+class TestWebJobSession:
+    def test_concurrency(self, clear, http_server):
+        urls = [f"{http_server.url}/{i}?delay=0.2" for i in range(8)]
+        test_queue = Queue()
+        job = WebJob(urls=urls, queue=test_queue, concurrency=4)
+        scheduler = Scheduler()
+        scheduler.run()
+        start = time.monotonic()
+        scheduler.schedule(job)
+        while not job.is_finished:
+            time.sleep(0.01)
+
+        assert time.monotonic() - start < 0.2 * len(urls) / 2
+        assert test_queue.qsize() == len(urls)
+        assert http_server.max_in_flight == 4
+
+    def test_keep_alive(self, clear, http_server):
+        urls = [f"{http_server.url}/{i}" for i in range(5)]
+        scheduler = Scheduler()
+        job = WebJob(urls=urls)
+        scheduler.schedule(job)
+        scheduler.join()
+
+        assert len(http_server.clients) == 1
+
+    def test_per_host_limit(self, clear, http_server):
+        urls = [f"{http_server.url}/{i}?delay=0.1" for i in range(6)]
+        scheduler = Scheduler(http_session=HttpSession(per_host=2))
+        job = WebJob(urls=urls, concurrency=len(urls))
+        scheduler.schedule(job)
+        scheduler.join()
+
+        assert http_server.max_in_flight == 2
+
+    def test_yields_responses(self, http_server):
+        urls = [f"{http_server.url}/{i}" for i in range(3)]
+        job = WebJob(urls=urls, concurrency=3)
+        responses = list(job.target())
+
+        assert sorted(response.content for response in responses) == [
+            f"/{i}".encode() for i in range(3)
+        ]
+
+
+class TestWebJobStream:
+    SIZE = 10 * 1024
+    CHUNK_SIZE = 1024
+    TEST_FILE = "stream.bin"
+
+    @pytest.fixture
+    def clear_files(self):
+        yield
+        if os.path.exists(self.TEST_FILE):
+            os.unlink(self.TEST_FILE)
+
+    def test_chunks(self, http_server):
+        test_queue = Queue()
+        job = WebJob(
+            urls=[f"{http_server.url}/?size={self.SIZE}"],
+            queue=test_queue,
+            stream=True,
+            chunk_size=self.CHUNK_SIZE,
+        )
+        chunks = list(job.target())
+
+        assert len(chunks) == self.SIZE // self.CHUNK_SIZE
+        assert all(len(chunk) == self.CHUNK_SIZE for chunk in chunks)
+        assert b"".join(
+            test_queue.get() for _ in range(test_queue.qsize())
+        ) == make_body(self.SIZE)
+
+    def test_bounded_queue(self, http_server):
+        test_queue = Queue(maxsize=2)
+        job = WebJob(
+            urls=[f"{http_server.url}/?size={self.SIZE}"],
+            queue=test_queue,
+            stream=True,
+            chunk_size=self.CHUNK_SIZE,
+        )
+        received = []
+        for chunk in job.target():
+            assert test_queue.qsize() <= 2
+            if chunk is None:
+                received.append(test_queue.get())
+
+        while not test_queue.empty():
+            received.append(test_queue.get())
+        assert b"".join(received) == make_body(self.SIZE)
+
+    def test_path(self, http_server, clear_files):
+        job = WebJob(
+            urls=[f"{http_server.url}/?size={self.SIZE}"],
+            stream=True,
+            chunk_size=self.CHUNK_SIZE,
+            path=self.TEST_FILE,
+        )
+        list(job.target())
+
+        with open(self.TEST_FILE, "rb") as file:
+            assert file.read() == make_body(self.SIZE)
+
+    def test_file_job(self, clear, http_server, clear_files):
+        test_queue = Queue()
+        chunks = self.SIZE // self.CHUNK_SIZE
+        download = WebJob(
+            urls=[f"{http_server.url}/?size={self.SIZE}"],
+            queue=test_queue,
+            stream=True,
+            chunk_size=self.CHUNK_SIZE,
+        )
+        save = FileJob(
+            actions=[("a", self.TEST_FILE)] * chunks,
+            queue=test_queue,
+            dependencies=[download],
+        )
+        scheduler = Scheduler()
+        scheduler.schedule(save)
+        scheduler.join()
+
+        with open(self.TEST_FILE, "rb") as file:
+            assert file.read() == make_body(self.SIZE)
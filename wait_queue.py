@@ -0,0 +1,80 @@
+import heapq
+from collections import deque
+from typing import Iterator
+
+from jobs import Job, JobType
+
+
+class WaitQueue:
+    """Jobs waiting for a free slot in the pool
+
+    Higher priority classes are served first
+    Within a priority class job types share slots in proportion to
+    their `weights`, jobs of one type are served in FIFO order
+    Push and pop take O(log p) for p distinct priorities
+    and O(t) for t job types waiting in the priority class
+    """
+
+    def __init__(self, weights: dict[JobType, float] | None = None):
+        self.weights = weights or {}
+        self.classes: dict[int, dict[JobType | None, deque[Job]]] = {}
+        self.priorities: list[int] = []
+        self.virtual_time: dict[JobType | None, float] = {}
+        self.served_time = 0.0
+        self.waiting: dict[JobType | None, int] = {}
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[Job]:
+        """Iterates jobs by priority, then by type, without removing them"""
+        for priority in sorted(self.classes, reverse=True):
+            for jobs in self.classes[priority].values():
+                yield from jobs
+
+    def push(self, job: Job):
+        priority = job.wait_priority
+        jobs_class = self.classes.get(priority)
+        if jobs_class is None:
+            jobs_class = self.classes[priority] = {}
+            heapq.heappush(self.priorities, -priority)
+        jobs = jobs_class.get(job.job_type)
+        if jobs is None:
+            jobs = jobs_class[job.job_type] = deque()
+        jobs.append(job)
+        if not self.waiting.get(job.job_type):
+            self.__catch_up(job.job_type)
+        self.waiting[job.job_type] = self.waiting.get(job.job_type, 0) + 1
+        self.size += 1
+
+    def pop(self) -> Job:
+        """Removes next job
+
+        Picks the job type with the least virtual time in the highest
+        priority class, its virtual time grows by the inverse of weight
+        Raises IndexError if queue is empty
+        """
+        if not self.priorities:
+            raise IndexError("pop from an empty wait queue")
+        priority = -self.priorities[0]
+        jobs_class = self.classes[priority]
+        job_type = min(jobs_class, key=self.virtual_time.__getitem__)
+        jobs = jobs_class[job_type]
+        job = jobs.popleft()
+        self.served_time = self.virtual_time[job_type]
+        self.virtual_time[job_type] += 1 / self.weights.get(job_type, 1)
+        self.waiting[job_type] -= 1
+        if not jobs:
+            del jobs_class[job_type]
+            if not jobs_class:
+                del self.classes[priority]
+                heapq.heappop(self.priorities)
+        self.size -= 1
+        return job
+
+    def __catch_up(self, job_type: JobType | None):
+        """Job type which had no waiting jobs gets no credit for idle time"""
+        self.virtual_time[job_type] = max(
+            self.virtual_time.get(job_type, 0.0), self.served_time
+        )